@@ -0,0 +1,183 @@
+"""
+按端点的熔断器
+
+每个端点一个熔断器：被限流 (403 / 429 / 503) 时立即断开，其他失败连续 failure_threshold 次后断开。
+断开的时长按连续断开次数指数增长（带随机抖动，避免所有端点同时恢复），
+服务器给出 Retry-After 时至少等待该时长。冷却期结束后只放行一个探测请求（半开），
+成功则闭合，失败则以更长的时长重新断开。
+
+BreakerBoard 同时记录每个端点最近一次成功的时间和成功的方式（如是否使用API密钥），
+order() 把最近成功的端点排在最前，下一次先尝试上次成功的策略。
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 表示被限流或封禁的状态码，出现一次即断开
+THROTTLE_STATUSES = frozenset((403, 429, 503))
+
+
+def parse_retry_after(value, now=None):
+    """解析 Retry-After（秒数或HTTP日期），返回需要等待的秒数，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class CircuitBreaker:
+    """单个端点的熔断器状态（由 BreakerBoard 加锁访问）"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0  # 连续失败次数
+        self.trips = 0  # 连续断开次数，决定下一次断开的时长
+        self.open_until = 0.0
+        self.probing = False  # 半开状态下是否已有探测请求
+        self.last_status = None
+        self.last_success_at = None  # time.time()，仅用于排序和展示
+        self.variant = None  # 最近一次成功的方式
+        self.total_failures = 0
+        self.total_rejected = 0
+
+
+class BreakerBoard:
+    """
+    一组端点熔断器。
+    base_delay / max_delay: 第 n 次连续断开的时长为 min(max_delay, base_delay * 2^(n-1))，
+    实际时长在其 [1 - jitter, 1] 倍之间随机；max_retry_after 限制服务器要求的等待时间。
+    """
+
+    def __init__(self, failure_threshold=3, base_delay=30, max_delay=1800, jitter=0.5, max_retry_after=3600):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_retry_after = max_retry_after
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            self._breakers[key] = breaker
+        return breaker
+
+    def allow(self, key):
+        """是否可以向该端点发送请求；冷却期结束后只放行一个探测请求"""
+        with self._lock:
+            breaker = self._get(key)
+            if breaker.state == CLOSED:
+                return True
+            if breaker.state == OPEN and time.monotonic() >= breaker.open_until:
+                breaker.state = HALF_OPEN
+                breaker.probing = False
+            if breaker.state == HALF_OPEN and not breaker.probing:
+                breaker.probing = True
+                return True
+            breaker.total_rejected += 1
+            return False
+
+    def record_success(self, key, variant=None):
+        """请求成功：闭合熔断器并记住成功的方式"""
+        with self._lock:
+            breaker = self._get(key)
+            breaker.state = CLOSED
+            breaker.failures = 0
+            breaker.trips = 0
+            breaker.probing = False
+            breaker.last_status = 200
+            breaker.last_success_at = time.time()
+            breaker.variant = variant
+
+    def record_failure(self, key, status=None, retry_after=None):
+        """
+        请求失败。status 为最后一次响应的状态码（网络错误时为 None 或 0），
+        retry_after 为响应头 Retry-After 的原始值。返回断开的秒数，未断开时返回 0。
+        """
+        wait = parse_retry_after(retry_after)
+        with self._lock:
+            breaker = self._get(key)
+            breaker.failures += 1
+            breaker.total_failures += 1
+            breaker.last_status = status
+            throttled = status in THROTTLE_STATUSES or wait is not None
+            if not (throttled or breaker.state == HALF_OPEN or breaker.failures >= self.failure_threshold):
+                return 0.0
+            breaker.trips += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (breaker.trips - 1))
+            delay *= random.uniform(1 - self.jitter, 1)
+            if wait is not None:
+                delay = max(delay, min(wait, self.max_retry_after))
+            breaker.state = OPEN
+            breaker.probing = False
+            breaker.open_until = time.monotonic() + delay
+            return delay
+
+    def release(self, key):
+        """已放行的请求没有结果（如所属策略被取消），允许下一个探测请求"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is not None:
+                breaker.probing = False
+
+    def order(self, keys):
+        """最近成功的端点排在最前，从未成功的保持原有顺序，断开的排在最后"""
+        with self._lock:
+            now = time.monotonic()
+
+            def rank(item):
+                index, key = item
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    return (0, 0, index)
+                is_open = breaker.state == OPEN and now < breaker.open_until
+                return (1 if is_open else 0, -(breaker.last_success_at or 0), index)
+
+            return [key for _, key in sorted(enumerate(keys), key=rank)]
+
+    def variant(self, key):
+        """该端点最近一次成功的方式，从未成功时返回 None"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            return breaker.variant if breaker else None
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            result = {}
+            for key, breaker in self._breakers.items():
+                state = breaker.state
+                if state == OPEN and now >= breaker.open_until:
+                    state = HALF_OPEN
+                result[key] = {
+                    "state": state,
+                    "consecutive_failures": breaker.failures,
+                    "trips": breaker.trips,
+                    "retry_in": round(max(0.0, breaker.open_until - now), 1) if state == OPEN else 0.0,
+                    "last_status": breaker.last_status,
+                    "last_success": (
+                        datetime.fromtimestamp(breaker.last_success_at).strftime("%Y-%m-%d %H:%M:%S")
+                        if breaker.last_success_at else None
+                    ),
+                    "variant": breaker.variant,
+                    "failures": breaker.total_failures,
+                    "rejected": breaker.total_rejected,
+                }
+            return result
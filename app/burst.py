@@ -0,0 +1,154 @@
+"""
+连拍
+
+在限定时长内按指定帧率抓取屏幕，用于观察短时间内的变化。
+抓取线程按固定频率把原始像素写入预先分配的缓冲区环；编码线程每次取出一批帧一起编码，
+编码完成后缓冲区归还给抓取线程。编码跟不上时没有空闲缓冲区，该帧丢弃并计数，内存占用固定。
+缓冲区数量由 buffer_slots() 按内存上限计算。
+"""
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+def buffer_slots(frame_bytes, budget_bytes, max_slots):
+    """内存上限内能预先分配的缓冲区数量（不超过 max_slots），一帧都放不下时返回 0"""
+    return max(0, min(max_slots, budget_bytes // frame_bytes))
+
+
+class BurstCapture:
+    """
+    一次连拍。
+    grabber: 提供 grab_into(buffer) 的抓取器；encode_batch(frames) 编码并保存一批帧，
+    frames 为 [(帧序号, 像素内存视图, (宽, 高), 原始像素格式)]，返回对应的文件名列表；
+    on_complete(burst) 在所有帧编码完成后调用。
+    """
+
+    def __init__(self, burst_id, grabber, fps, duration, encode_batch, on_complete=None,
+                 frame_bytes=None, slots=8, batch_size=4):
+        self.burst_id = burst_id
+        self.grabber = grabber
+        self.fps = fps
+        self.duration = duration
+        self.encode_batch = encode_batch
+        self.on_complete = on_complete
+        self.batch_size = batch_size
+        self.total = max(1, int(round(fps * duration)))
+        frame_bytes = frame_bytes or grabber.frame_bytes()
+        self._free = queue.Queue()
+        for _ in range(slots):
+            self._free.put(bytearray(frame_bytes))
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.done = threading.Event()
+        self.frames = []  # [{"index", "offset_ms", "filename"}]，按帧序号排列
+        self.captured = 0
+        self.dropped = 0  # 没有空闲缓冲区而丢弃的帧
+        self.missed = 0  # 抓取落后超过一帧而错过的帧
+        self.errors = 0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.time()
+        threading.Thread(target=self._capture, daemon=True, name=f"burst-{self.burst_id}").start()
+        threading.Thread(target=self._encode, daemon=True, name=f"burst-encode-{self.burst_id}").start()
+
+    def stop(self):
+        """提前结束连拍，已抓取的帧仍会编码"""
+        self._stop.set()
+
+    def _capture(self):
+        interval = 1.0 / self.fps
+        start = time.monotonic()
+        try:
+            for index in range(self.total):
+                due = start + index * interval
+                delay = due - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                if self._stop.is_set():
+                    break
+                if time.monotonic() - due >= interval:
+                    # 上一帧抓取耗时超过一个周期，本帧已经错过
+                    with self._lock:
+                        self.missed += 1
+                    continue
+                try:
+                    buffer = self._free.get_nowait()
+                except queue.Empty:
+                    with self._lock:
+                        self.dropped += 1
+                    continue
+                offset_ms = int((time.monotonic() - start) * 1000)
+                try:
+                    length, size, raw_mode = self.grabber.grab_into(buffer)
+                except Exception as e:
+                    self._free.put(buffer)
+                    with self._lock:
+                        self.errors += 1
+                    print(f"[连拍 {self.burst_id}] 抓取失败: {e}")
+                    continue
+                with self._lock:
+                    self.captured += 1
+                self._ready.put((index, offset_ms, buffer, length, size, raw_mode))
+        finally:
+            self._ready.put(_DONE)
+
+    def _encode(self):
+        finished = False
+        while not finished:
+            batch = [self._ready.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._ready.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _DONE:
+                batch.pop()
+                finished = True
+            if not batch:
+                continue
+            try:
+                filenames = self.encode_batch([
+                    (index, memoryview(buffer)[:length], size, raw_mode)
+                    for index, _, buffer, length, size, raw_mode in batch
+                ])
+                with self._lock:
+                    self.frames.extend(
+                        {"index": index, "offset_ms": offset_ms, "filename": filename}
+                        for (index, offset_ms, *_), filename in zip(batch, filenames)
+                    )
+            except Exception as e:
+                with self._lock:
+                    self.errors += len(batch)
+                print(f"[连拍 {self.burst_id}] 编码失败: {e}")
+            finally:
+                for item in batch:
+                    self._free.put(item[2])
+        self.frames.sort(key=lambda frame: frame["index"])
+        try:
+            if self.on_complete is not None:
+                self.on_complete(self)
+        finally:
+            self.done.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                "id": self.burst_id,
+                "fps": self.fps,
+                "duration": self.duration,
+                "state": "done" if self.done.is_set() else "running",
+                "started_at": (
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)) if self.started_at else None
+                ),
+                "planned": self.total,
+                "captured": self.captured,
+                "encoded": len(self.frames),
+                "dropped": self.dropped,
+                "missed": self.missed,
+                "errors": self.errors,
+            }
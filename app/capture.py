@@ -0,0 +1,613 @@
+"""
+屏幕抓取后端
+
+所有后端提供同样的接口：grab() 返回 PIL 图像（定时截图使用），grab_into(buffer) 把原始像素写入调用方
+提供的缓冲区（连拍使用，反复使用同一组缓冲区，不为每一帧创建新的图像对象）。
+
+- xshm: 通过 X11 共享内存扩展 (MIT-SHM) 直接读取根窗口，像素由 X 服务器写入共享内存段，
+  不经过 socket 传输；适用于 Linux 桌面和 Xvfb 虚拟显示器，只依赖系统的 libX11 / libXext
+- mss: 使用 mss 读取指定显示器或矩形区域（需要安装 mss），支持 X11 / Windows / macOS 和多显示器
+- pyautogui: pyautogui.screenshot()，在 Linux 上调用外部截图工具，速度最慢
+- synthetic: 生成带移动竖条的测试图案，不需要显示器，用于无显示环境下测试流水线
+
+只关心部分画面时，抓取一次整帧原始像素，再用 crop_frame() 按区域（矩形或显示器）直接从缓冲区解码，
+不先创建整帧图像再裁剪。
+
+运行 `python -m app.capture` 可以对比各个可用后端的抓取速度。
+"""
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+import time
+
+from PIL import Image
+
+try:
+    import pyautogui
+    PYAUTOGUI_AVAILABLE = True
+except Exception:  # 没有显示器时导入本身就会失败
+    pyautogui = None
+    PYAUTOGUI_AVAILABLE = False
+
+try:
+    import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    mss = None
+    MSS_AVAILABLE = False
+
+
+def display_available():
+    """是否有可用的显示环境（Linux 上需要 DISPLAY，Windows / macOS 总是有）"""
+    if sys.platform.startswith("linux"):
+        return bool(os.environ.get("DISPLAY"))
+    return True
+
+
+class CaptureBackend:
+    """
+    抓取后端的基类。
+    grab_into(buffer) 返回 (写入的字节数, (宽, 高), 原始像素格式)，原始像素格式用于 Image.frombuffer；
+    frame_bytes() 返回一帧原始像素的最大字节数，用于预先分配缓冲区；
+    monitors() 返回各显示器在抓取画面中的区域 [(left, top, width, height)]，第 0 项为整个画面，
+    不能区分显示器的后端返回空列表（视为只有一个显示器）。
+    """
+
+    name = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def grab_into(self, buffer):
+        raise NotImplementedError
+
+    def frame_bytes(self):
+        raise NotImplementedError
+
+    def monitors(self):
+        return []
+
+    def grab(self):
+        buffer = bytearray(self.frame_bytes())
+        length, size, raw_mode = self.grab_into(buffer)
+        return Image.frombuffer("RGB", size, buffer, "raw", raw_mode, 0, 1)
+
+    def close(self):
+        pass
+
+
+def _copy_into(buffer, data):
+    length = len(data)
+    if length > len(buffer):
+        raise ValueError(f"帧大小 {length} 超过缓冲区大小 {len(buffer)}")
+    buffer[:length] = data
+    return length
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    """pyautogui.screenshot()，每帧都会创建新的图像"""
+
+    name = "pyautogui"
+
+    @classmethod
+    def available(cls):
+        return PYAUTOGUI_AVAILABLE
+
+    def grab(self):
+        return pyautogui.screenshot()
+
+    def grab_into(self, buffer):
+        image = pyautogui.screenshot().convert("RGB")
+        return _copy_into(buffer, image.tobytes()), image.size, "RGB"
+
+    def frame_bytes(self):
+        width, height = pyautogui.size()
+        return width * height * 3
+
+
+class MssBackend(CaptureBackend):
+    """
+    使用 mss 抓取。monitor 为 0 时抓取所有显示器组成的虚拟桌面，1、2… 为单个显示器；
+    region 为 (left, top, width, height) 时只抓取该矩形（坐标相对于虚拟桌面），优先于 monitor。
+    mss 的实例不能跨线程使用，每个线程各自创建。
+    """
+
+    name = "mss"
+
+    def __init__(self, monitor=0, region=None):
+        self.monitor = monitor
+        self.region = region
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        return MSS_AVAILABLE and display_available()
+
+    def _mss(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._lock:
+                self._instances.append(sct)
+        return sct
+
+    def monitors(self):
+        """各显示器与抓取区域的交集，坐标相对于抓取区域的左上角"""
+        area = self._area()
+        right, bottom = area["width"], area["height"]
+        result = []
+        for monitor in self._mss().monitors:
+            left = max(0, monitor["left"] - area["left"])
+            top = max(0, monitor["top"] - area["top"])
+            width = min(right, monitor["left"] - area["left"] + monitor["width"]) - left
+            height = min(bottom, monitor["top"] - area["top"] + monitor["height"]) - top
+            result.append((left, top, max(0, width), max(0, height)))
+        return result
+
+    def _area(self):
+        if self.region is not None:
+            left, top, width, height = self.region
+            return {"left": left, "top": top, "width": width, "height": height}
+        monitors = self._mss().monitors
+        if not 0 <= self.monitor < len(monitors):
+            raise ValueError(f"显示器 {self.monitor} 不存在，共有 {len(monitors) - 1} 个显示器")
+        return monitors[self.monitor]
+
+    def grab(self):
+        shot = self._mss().grab(self._area())
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+    def grab_into(self, buffer):
+        shot = self._mss().grab(self._area())
+        return _copy_into(buffer, shot.raw), shot.size, "BGRX"
+
+    def frame_bytes(self):
+        area = self._area()
+        return area["width"] * area["height"] * 4
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for sct in instances:
+            try:
+                sct.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+# X11 共享内存抓取所需的结构，字段与 Xlib.h / XShm.h 一致
+class _XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+_ZPIXMAP = 2
+_ALL_PLANES = ctypes.c_ulong(-1).value
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+_X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+_xlib = None
+_xlib_lock = threading.Lock()
+
+
+def _load_xlib():
+    """加载 libX11 / libXext / libc 并声明用到的函数，找不到时返回 None"""
+    global _xlib
+    with _xlib_lock:
+        if _xlib is not None:
+            return _xlib or None
+        _xlib = False
+        if not sys.platform.startswith("linux"):
+            return None
+        paths = [ctypes.util.find_library(name) for name in ("X11", "Xext", "c")]
+        if not all(paths):
+            return None
+        try:
+            x11, xext, libc = (ctypes.CDLL(path, use_errno=True) for path in paths)
+        except OSError:
+            return None
+        p, ulong, integer = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int
+        signatures = [
+            (x11, "XOpenDisplay", p, [ctypes.c_char_p]),
+            (x11, "XCloseDisplay", integer, [p]),
+            (x11, "XDefaultScreen", integer, [p]),
+            (x11, "XRootWindow", ulong, [p, integer]),
+            (x11, "XDefaultVisual", p, [p, integer]),
+            (x11, "XDefaultDepth", integer, [p, integer]),
+            (x11, "XDisplayWidth", integer, [p, integer]),
+            (x11, "XDisplayHeight", integer, [p, integer]),
+            (x11, "XSync", integer, [p, integer]),
+            (x11, "XFree", integer, [p]),
+            (x11, "XSetErrorHandler", p, [p]),
+            (xext, "XShmQueryExtension", integer, [p]),
+            (xext, "XShmCreateImage", ctypes.POINTER(_XImage),
+             [p, p, ctypes.c_uint, integer, p, ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]),
+            (xext, "XShmAttach", integer, [p, ctypes.POINTER(_XShmSegmentInfo)]),
+            (xext, "XShmDetach", integer, [p, ctypes.POINTER(_XShmSegmentInfo)]),
+            (xext, "XShmGetImage", integer, [p, ulong, ctypes.POINTER(_XImage), integer, integer, ulong]),
+            (libc, "shmget", integer, [integer, ctypes.c_size_t, integer]),
+            (libc, "shmat", p, [integer, p, integer]),
+            (libc, "shmdt", integer, [p]),
+            (libc, "shmctl", integer, [integer, integer, p]),
+        ]
+        functions = {}
+        try:
+            for library, name, restype, argtypes in signatures:
+                function = getattr(library, name)
+                function.restype = restype
+                function.argtypes = argtypes
+                functions[name] = function
+        except AttributeError:
+            return None
+        _xlib = functions
+        return _xlib
+
+
+class _XShmSession:
+    """
+    到 X 服务器的连接及其共享内存段（由 XShmBackend 加锁使用）。
+    存在期间安装 X 错误处理函数，X 错误（如共享内存附加失败）只记录，不让 Xlib 结束进程；
+    关闭时恢复原来的处理函数。
+    """
+
+    def __init__(self, x):
+        self.x = x
+        self.failed = False
+        self._handler = _X_ERROR_HANDLER(self._on_error)  # 保持引用，否则回调会被回收
+        self._previous_handler = x["XSetErrorHandler"](ctypes.cast(self._handler, ctypes.c_void_p))
+        self.display = x["XOpenDisplay"](None)
+        if not self.display:
+            self._restore_handler()
+            raise RuntimeError(f"无法连接显示器 {os.environ.get('DISPLAY')}")
+        if not x["XShmQueryExtension"](self.display):
+            x["XCloseDisplay"](self.display)
+            self._restore_handler()
+            raise RuntimeError("X 服务器不支持共享内存扩展 (MIT-SHM)")
+        self.screen = x["XDefaultScreen"](self.display)
+        self.root = x["XRootWindow"](self.display, self.screen)
+        self.image = None
+        self.info = _XShmSegmentInfo()
+        self.size = None
+
+    def _on_error(self, display, event):
+        self.failed = True
+        return 0
+
+    def _restore_handler(self):
+        self.x["XSetErrorHandler"](self._previous_handler)
+
+    def screen_size(self):
+        x = self.x
+        return x["XDisplayWidth"](self.display, self.screen), x["XDisplayHeight"](self.display, self.screen)
+
+    def _attach(self, width, height):
+        x = self.x
+        self._detach()
+        image = x["XShmCreateImage"](
+            self.display, x["XDefaultVisual"](self.display, self.screen),
+            x["XDefaultDepth"](self.display, self.screen), _ZPIXMAP, None,
+            ctypes.byref(self.info), width, height
+        )
+        if not image:
+            raise RuntimeError("XShmCreateImage 失败")
+        if image.contents.bits_per_pixel != 32:
+            x["XFree"](image)
+            raise RuntimeError(f"不支持每像素 {image.contents.bits_per_pixel} 位的显示器")
+        length = image.contents.bytes_per_line * image.contents.height
+        shmid = x["shmget"](_IPC_PRIVATE, length, _IPC_CREAT | 0o600)
+        if shmid < 0:
+            x["XFree"](image)
+            raise OSError(ctypes.get_errno(), "shmget 失败")
+        address = x["shmat"](shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            x["shmctl"](shmid, _IPC_RMID, None)
+            x["XFree"](image)
+            raise OSError(ctypes.get_errno(), "shmat 失败")
+        self.info.shmid = shmid
+        self.info.shmaddr = address
+        self.info.readOnly = 0
+        image.contents.data = address
+        self.failed = False
+        x["XShmAttach"](self.display, ctypes.byref(self.info))
+        x["XSync"](self.display, 0)
+        # 双方都已附加，标记删除后进程退出时共享内存段会被自动回收
+        x["shmctl"](shmid, _IPC_RMID, None)
+        self.image = image
+        if self.failed:
+            self._detach()
+            raise RuntimeError("XShmAttach 失败（X 服务器可能在另一台主机上）")
+        self.size = (width, height)
+
+    def _detach(self):
+        if self.image is None:
+            return
+        x = self.x
+        x["XShmDetach"](self.display, ctypes.byref(self.info))
+        x["XFree"](self.image)  # XShmCreateImage 创建的图像不拥有像素内存，只释放结构体
+        x["shmdt"](self.info.shmaddr)
+        self.image = None
+        self.size = None
+
+    def grab(self):
+        """抓取根窗口到共享内存，返回 (像素地址, 每行字节数, (宽, 高))；下一次抓取前有效"""
+        size = self.screen_size()
+        if size != self.size:
+            self._attach(*size)
+        self.failed = False
+        if not self.x["XShmGetImage"](self.display, self.root, self.image, 0, 0, _ALL_PLANES) or self.failed:
+            raise RuntimeError("XShmGetImage 失败")
+        return self.info.shmaddr, self.image.contents.bytes_per_line, size
+
+    def close(self):
+        self._detach()
+        self.x["XCloseDisplay"](self.display)
+        self._restore_handler()
+
+
+class XShmBackend(CaptureBackend):
+    """
+    X11 共享内存抓取，适用于 Linux 桌面和 Xvfb 虚拟显示器（如 `Xvfb :99 -screen 0 1920x1080x24`）。
+    所有线程共用一个连接和一个共享内存段（首次抓取时创建，分辨率变化时重新创建），抓取时加锁；
+    grab_into 从共享内存直接复制到调用方的缓冲区，中间不创建 bytes 对象。
+    """
+
+    name = "xshm"
+
+    def __init__(self):
+        self.x = _load_xlib()
+        if self.x is None:
+            raise RuntimeError("找不到 libX11 / libXext")
+        self._session = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        return display_available() and _load_xlib() is not None
+
+    def _connect(self):
+        """共用的会话（在锁内调用）"""
+        if self._session is None:
+            self._session = _XShmSession(self.x)
+        return self._session
+
+    def grab_into(self, buffer):
+        with self._lock:
+            address, stride, (width, height) = self._connect().grab()
+            row_bytes = width * 4
+            length = row_bytes * height
+            if length > len(buffer):
+                raise ValueError(f"帧大小 {length} 超过缓冲区大小 {len(buffer)}")
+            target = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+            if stride == row_bytes:
+                ctypes.memmove(target, address, length)
+            else:
+                # 行尾有填充时逐行复制，缓冲区中的像素总是紧密排列
+                for y in range(height):
+                    ctypes.memmove(target + y * row_bytes, address + y * stride, row_bytes)
+        return length, (width, height), "BGRX"
+
+    def grab(self):
+        with self._lock:
+            address, stride, size = self._connect().grab()
+            data = ctypes.string_at(address, stride * size[1])
+        return Image.frombytes("RGB", size, data, "raw", "BGRX", stride)
+
+    def frame_bytes(self):
+        with self._lock:
+            width, height = self._connect().screen_size()
+        return width * height * 4
+
+    def close(self):
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+
+class SyntheticBackend(CaptureBackend):
+    """
+    测试图案：八条彩色竖条，外加一条每帧右移 step 像素的橙色竖条，使相邻两帧不完全相同。
+    不需要显示器，固定图案只生成一次，每帧只改写移动竖条所在的几列。
+    monitors 可以模拟多个显示器，如 [(0, 0, 960, 1080), (960, 0, 960, 1080)]。
+    """
+
+    name = "synthetic"
+
+    _BARS = [
+        (255, 255, 255), (255, 255, 0), (0, 255, 255), (0, 255, 0),
+        (255, 0, 255), (255, 0, 0), (0, 0, 255), (0, 0, 0),
+    ]
+
+    def __init__(self, size=(1920, 1080), step=16, marker_width=8, monitors=None):
+        self.size = tuple(size)
+        self._monitors = [tuple(monitor) for monitor in monitors or ()]
+        self.step = step
+        self.marker_width = marker_width
+        width, height = self.size
+        row = bytearray()
+        for x in range(width):
+            row += bytes(self._BARS[x * len(self._BARS) // width])
+        self._row = bytes(row)
+        self._pattern = self._row * height
+        self._frame = 0
+        self._lock = threading.Lock()
+
+    def grab_into(self, buffer):
+        width, height = self.size
+        length = _copy_into(buffer, self._pattern)
+        with self._lock:
+            frame = self._frame
+            self._frame += 1
+        marker_width = min(self.marker_width, width)
+        start = (frame * self.step) % (width - marker_width + 1) * 3
+        marker = b"\xff\x80\x00" * marker_width
+        view = memoryview(buffer)
+        row_bytes = width * 3
+        for y in range(height):
+            offset = y * row_bytes + start
+            view[offset:offset + len(marker)] = marker
+        return length, self.size, "RGB"
+
+    def frame_bytes(self):
+        return self.size[0] * self.size[1] * 3
+
+    def monitors(self):
+        if not self._monitors:
+            return []
+        return [(0, 0) + self.size] + self._monitors
+
+
+def resolve_regions(regions, size, monitors=()):
+    """
+    把区域配置解析为抓取画面中的矩形 {名称: (left, top, width, height)}。
+    regions 的值为显示器序号（0 为整个画面）或矩形 (left, top, width, height)；
+    矩形超出画面的部分被截掉，完全在画面外或显示器不存在的区域被忽略。
+    """
+    width, height = size
+    monitors = list(monitors) or [(0, 0, width, height), (0, 0, width, height)]
+    resolved = {}
+    for name, spec in regions.items():
+        if isinstance(spec, int):
+            if not 0 <= spec < len(monitors):
+                print(f"区域 {name}: 显示器 {spec} 不存在，共有 {len(monitors) - 1} 个显示器")
+                continue
+            spec = monitors[spec]
+        left, top, region_width, region_height = spec
+        right = min(width, left + region_width)
+        bottom = min(height, top + region_height)
+        left, top = max(0, left), max(0, top)
+        if right <= left or bottom <= top:
+            print(f"区域 {name}: {spec} 不在 {width}x{height} 的画面内")
+            continue
+        resolved[name] = (left, top, right - left, bottom - top)
+    return resolved
+
+
+def crop_frame(buffer, size, raw_mode, rect=None):
+    """
+    从 grab_into 写入的原始像素中取出一个矩形区域的 RGB 图像。
+    只解码该区域的像素（按整帧的行跨度读取缓冲区的视图），不创建整帧图像，也不复制整帧缓冲区；
+    返回的图像不引用缓冲区，缓冲区可以立即用于下一次抓取。
+    """
+    width, height = size
+    left, top, region_width, region_height = rect or (0, 0, width, height)
+    pixel_bytes = len(raw_mode)  # RGB 为 3，BGRX 为 4
+    stride = width * pixel_bytes
+    offset = top * stride + left * pixel_bytes
+    end = offset + (region_height - 1) * stride + region_width * pixel_bytes
+    view = memoryview(buffer)[offset:end]
+    return Image.frombuffer("RGB", (region_width, region_height), view, "raw", raw_mode, stride, 1)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (XShmBackend, MssBackend, PyAutoGuiBackend, SyntheticBackend)
+}
+AUTO_ORDER = ("xshm", "mss", "pyautogui")  # auto 按此顺序选择第一个可用的后端
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def create_backend(name="auto", options=None):
+    """
+    创建抓取后端并确认可以抓取（连接显示器等），无法启动时抛出 RuntimeError。
+    name 为 auto 时按 AUTO_ORDER 选择第一个能启动的后端；测试图案只在明确指定 synthetic 时使用。
+    options 按后端名称提供构造参数，如 {"mss": {"monitor": 1}}。
+    """
+    options = options or {}
+    if name != "auto":
+        backend = BACKENDS.get(name)
+        if backend is None:
+            raise RuntimeError(f"未知的抓取后端 {name}，可选: auto / {' / '.join(BACKENDS)}")
+        if not backend.available():
+            raise RuntimeError(f"抓取后端 {name} 不可用（缺少依赖或显示器）")
+        instance = backend(**options.get(name, {}))
+        try:
+            instance.frame_bytes()
+        except Exception as e:
+            instance.close()
+            raise RuntimeError(f"抓取后端 {name} 初始化失败: {e}") from e
+        return instance
+    errors = []
+    for candidate in AUTO_ORDER:
+        backend = BACKENDS[candidate]
+        if not backend.available():
+            continue
+        try:
+            instance = backend(**options.get(candidate, {}))
+            instance.frame_bytes()  # 确认可以连接显示器
+            return instance
+        except Exception as e:
+            errors.append(f"{candidate}: {e}")
+    raise RuntimeError("没有可用的屏幕抓取后端" + (f"（{'；'.join(errors)}）" if errors else ""))
+
+
+def _benchmark():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    for name in BACKENDS:
+        if not BACKENDS[name].available():
+            print(f"{name}: 不可用")
+            continue
+        try:
+            backend = BACKENDS[name]()
+            buffer = bytearray(backend.frame_bytes())
+            _, size, _ = backend.grab_into(buffer)  # 预热：建立连接、分配共享内存
+
+            started = time.perf_counter()
+            for _ in range(frames):
+                backend.grab_into(buffer)
+            raw_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(frames):
+                backend.grab()
+            image_seconds = time.perf_counter() - started
+            backend.close()
+        except Exception as e:
+            print(f"{name}: 出错 {e}")
+            continue
+        print(f"{name} ({size[0]}x{size[1]}, {frames} 帧): "
+              f"原始像素 {frames / raw_seconds:.1f} 帧/秒 ({raw_seconds / frames * 1000:.2f} ms/帧), "
+              f"PIL 图像 {frames / image_seconds:.1f} 帧/秒 ({image_seconds / frames * 1000:.2f} ms/帧)")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,392 @@
+"""
+截图/HTML 持久化索引
+
+使用 SQLite 保存每次截图和 HTML 快照的元数据，服务重启后无需重新扫描目录。
+数据按页从磁盘读取，内存中不再常驻十万条字典。
+
+内存中只保留一份按时间升序排列的整数时间戳环形缓冲区，时间筛选和分页通过
+二分查找定位，单页查询的代价为 O(log n + page_size)；追加和淘汰最旧记录均为 O(1)。
+
+写入在锁内进行，每次写入后发布一份只读的时间戳快照 (CatalogSnapshot)。
+查询只读取当前发布的快照，并通过每个线程各自的只读连接读取数据库（WAL 允许并发读），
+不需要获取写锁，也不会看到写了一半的状态。
+"""
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+
+def timestamp_to_key(timestamp):
+    """将 YYYYMMDD_HHMMSS 转换为可排序的整数 YYYYMMDDHHMMSS"""
+    return int(timestamp.replace("_", ""))
+
+
+def key_to_timestamp(key):
+    """将整数键还原为 YYYYMMDD_HHMMSS"""
+    return f"{key // 1000000:08d}_{key % 1000000:06d}"
+
+
+def bound_to_key(value):
+    """
+    将筛选参数转换为整数键，不足14位时补0（例如 20240101 -> 20240101000000）。
+    无法解析时返回 None。
+    """
+    digits = value.replace("_", "")
+    if not digits.isdigit() or len(digits) > 14:
+        return None
+    return int(digits.ljust(14, "0"))
+
+
+class TimestampRing:
+    """
+    固定容量的整数时间戳环形缓冲区，按升序保存。
+    支持按逻辑下标访问，因此可以直接交给 bisect 做二分查找。
+    """
+
+    __slots__ = ("capacity", "_buf", "_head", "_size")
+
+    def __init__(self, capacity, keys=()):
+        self.capacity = capacity
+        self._buf = array("q", [0]) * min(capacity, 1024)
+        self._head = 0
+        self._size = 0
+        for key in keys:
+            self.append(key)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ring index out of range")
+        return self._buf[(self._head + index) % len(self._buf)]
+
+    def _grow(self):
+        """缓冲区未达到容量上限时按倍数扩容，并把数据整理为从0开始"""
+        new_len = min(self.capacity, len(self._buf) * 2)
+        items = array("q", (self[i] for i in range(self._size)))
+        self._buf = items + array("q", [0]) * (new_len - self._size)
+        self._head = 0
+
+    def append(self, key):
+        """在尾部追加一个键，已满时淘汰并返回最旧的键"""
+        evicted = None
+        if self._size == self.capacity:
+            evicted = self.popleft()
+        elif self._size == len(self._buf):
+            self._grow()
+        self._buf[(self._head + self._size) % len(self._buf)] = key
+        self._size += 1
+        return evicted
+
+    def popleft(self):
+        """移除并返回最旧的键"""
+        if not self._size:
+            raise IndexError("pop from empty ring")
+        key = self._buf[self._head]
+        self._head = (self._head + 1) % len(self._buf)
+        self._size -= 1
+        return key
+
+    def insert_sorted(self, key):
+        """
+        插入一个键并保持升序，返回被淘汰的键。
+        时间戳通常单调递增，此时等价于 append；乱序插入时逐个后移，代价与距离成正比。
+        """
+        if not self._size or key > self[-1]:
+            return self.append(key)
+        pos = bisect_left(self, key)
+        if pos < self._size and self[pos] == key:
+            return None
+        if self._size == self.capacity and pos == 0:
+            # 比缓冲区中所有键都旧，且已满，直接丢弃
+            return key
+        evicted = self.append(self[-1])
+        if evicted is not None:
+            pos -= 1
+        buf, n = self._buf, len(self._buf)
+        for i in range(self._size - 2, pos, -1):
+            buf[(self._head + i) % n] = buf[(self._head + i - 1) % n]
+        buf[(self._head + pos) % n] = key
+        return evicted
+
+    def to_array(self):
+        """按升序复制出所有键（最多两次切片拷贝）"""
+        end = self._head + self._size
+        if end <= len(self._buf):
+            return self._buf[self._head:end]
+        return self._buf[self._head:] + self._buf[:end - len(self._buf)]
+
+    def newest_first(self):
+        """按时间倒序遍历，无需排序"""
+        for i in range(self._size - 1, -1, -1):
+            yield self[i]
+
+
+class CatalogSnapshot:
+    """某一时刻索引的只读视图：升序时间戳数组的副本，发布后不再修改"""
+
+    __slots__ = ("keys", "version")
+
+    def __init__(self, keys, version):
+        self.keys = keys
+        self.version = version
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Catalog:
+    """
+    基于 SQLite 的时间序列索引，以 timestamp (YYYYMMDD_HHMMSS) 为主键。
+    超过 capacity 条记录时，写入新记录会自动淘汰最旧的一条。
+    indexes 中的列会建立二级索引，用于 has() 查询。
+    """
+
+    def __init__(self, db_path, name, columns, capacity=100000, indexes=()):
+        self.db_path = Path(db_path)
+        self.name = name
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.indexes = tuple(indexes)
+        self._fields = ("timestamp",) + self.columns
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 每个线程的只读连接
+        self._snapshot = CatalogSnapshot(array("q"), 0)
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_table()
+        self._keys = TimestampRing(capacity)
+        self._load_keys()
+
+    def _reader(self):
+        """当前线程的只读连接，查询不与写入共用连接和锁"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _publish(self):
+        """写入完成后发布新的只读快照（在锁内调用），替换引用是原子操作"""
+        self._snapshot = CatalogSnapshot(self._keys.to_array(), self._snapshot.version + 1)
+
+    @property
+    def snapshot(self):
+        """当前发布的只读快照"""
+        return self._snapshot
+
+    def _create_table(self):
+        """建表，并为旧库补齐新增的列"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} (timestamp TEXT PRIMARY KEY) WITHOUT ROWID"
+            )
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({self.name})")}
+            for column in self.columns:
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {self.name} ADD COLUMN {column}")
+            for column in self.indexes:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.name}_{column} ON {self.name} ({column})"
+                )
+
+    def _load_keys(self):
+        """从主键索引顺序读取最新的 capacity 个时间戳，构建升序环形缓冲区（无需排序）"""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT timestamp FROM (SELECT timestamp FROM {self.name} "
+                f"ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp",
+                (self.capacity,)
+            )
+            self._keys = TimestampRing(self.capacity, (timestamp_to_key(row[0]) for row in cursor))
+            self._publish()
+
+    def _insert_key(self, key):
+        """维护有序环形缓冲区，返回被淘汰的旧记录（在同一事务中从数据库删除）"""
+        evicted_key = self._keys.insert_sorted(key)
+        if evicted_key is None:
+            return None
+        timestamp = key_to_timestamp(evicted_key)
+        row = self._conn.execute(
+            f"SELECT {','.join(self._fields)} FROM {self.name} WHERE timestamp = ?",
+            (timestamp,)
+        ).fetchone()
+        self._conn.execute(f"DELETE FROM {self.name} WHERE timestamp = ?", (timestamp,))
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _range(keys, start_time=None, end_time=None, exact_time=None):
+        """通过二分查找得到筛选结果在有序数组中的区间 [lo, hi)"""
+        if exact_time:
+            key = bound_to_key(exact_time)
+            if key is None:
+                return 0, 0
+            lo = bisect_left(keys, key)
+            hi = lo + 1 if lo < len(keys) and keys[lo] == key else lo
+            return lo, hi
+        lo, hi = 0, len(keys)
+        if start_time:
+            key = bound_to_key(start_time)
+            lo = bisect_left(keys, key) if key is not None else hi
+        if end_time:
+            key = bound_to_key(end_time)
+            hi = bisect_right(keys, key) if key is not None else lo
+        return lo, max(lo, hi)
+
+    def _to_dict(self, row):
+        return dict(zip(self._fields, row))
+
+    def add(self, record):
+        """写入一条记录（相同时间戳会覆盖），返回因超出容量被淘汰的旧记录或 None"""
+        values = [record.get(field) for field in self._fields]
+        placeholders = ",".join("?" * len(self._fields))
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.name} ({','.join(self._fields)}) VALUES ({placeholders})",
+                    values
+                )
+                evicted = self._insert_key(timestamp_to_key(record["timestamp"]))
+            # 事务提交后再发布，读到新快照时数据库中一定已有对应的记录
+            self._publish()
+        return evicted
+
+    def add_many(self, records):
+        """
+        批量写入，用于首次从目录导入（记录可以是乱序的）。
+        写入后按主键顺序重建环形缓冲区，超出容量的最旧记录直接从数据库删除，返回删除的条数。
+        """
+        rows = [[record.get(field) for field in self._fields] for record in records]
+        if not rows:
+            return 0
+        placeholders = ",".join("?" * len(self._fields))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.name} ({','.join(self._fields)}) VALUES ({placeholders})",
+                rows
+            )
+        self._load_keys()
+        with self._lock, self._conn:
+            if len(self._keys) < self.capacity:
+                return 0
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.name} WHERE timestamp < ?",
+                (key_to_timestamp(self._keys[0]),)
+            )
+            return cursor.rowcount
+
+    def update(self, timestamp, **fields):
+        """更新已有记录的部分字段，记录不存在时返回 False"""
+        fields = {k: v for k, v in fields.items() if k in self.columns}
+        if not fields:
+            return False
+        assignments = ",".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE {self.name} SET {assignments} WHERE timestamp = ?",
+                list(fields.values()) + [timestamp]
+            )
+        return cursor.rowcount > 0
+
+    def get(self, timestamp):
+        """按时间戳获取单条记录"""
+        row = self._reader().execute(
+            f"SELECT {','.join(self._fields)} FROM {self.name} WHERE timestamp = ?",
+            (timestamp,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def has(self, column, value):
+        """是否存在某列等于 value 的记录"""
+        row = self._reader().execute(
+            f"SELECT 1 FROM {self.name} WHERE {column} = ? LIMIT 1", (value,)
+        ).fetchone()
+        return row is not None
+
+    def latest(self):
+        """获取最新的一条记录"""
+        keys = self._snapshot.keys
+        if not keys:
+            return None
+        return self.get(key_to_timestamp(keys[-1]))
+
+    def floor(self, timestamp):
+        """获取时间戳不晚于 timestamp 的最新一条记录，没有时返回 None"""
+        key = bound_to_key(timestamp)
+        if key is None:
+            return None
+        keys = self._snapshot.keys
+        index = bisect_right(keys, key)
+        if index == 0:
+            return None
+        return self.get(key_to_timestamp(keys[index - 1]))
+
+    def page(self, offset, limit, start_time=None, end_time=None, exact_time=None):
+        """按时间倒序分页查询，返回 (记录列表, 总数)；总数和区间来自同一份快照"""
+        keys = self._snapshot.keys
+        lo, hi = self._range(keys, start_time, end_time, exact_time)
+        total = hi - lo
+        # 倒序分页：第 offset 条对应升序数组中的 hi-1-offset
+        newest = hi - 1 - offset
+        oldest = max(lo, hi - offset - limit)
+        if offset >= total or newest < oldest:
+            return [], total
+        # 区间内的键是连续的，按首尾时间戳做一次主键范围查询即可
+        rows = self._reader().execute(
+            f"SELECT {','.join(self._fields)} FROM {self.name} "
+            f"WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp DESC",
+            (key_to_timestamp(keys[oldest]), key_to_timestamp(keys[newest]))
+        ).fetchall()
+        return [self._to_dict(row) for row in rows], total
+
+    def pop_oldest(self):
+        """删除并返回最早的一条记录"""
+        with self._lock:
+            if not self._keys:
+                return None
+            timestamp = key_to_timestamp(self._keys[0])
+            with self._conn:
+                row = self._conn.execute(
+                    f"SELECT {','.join(self._fields)} FROM {self.name} WHERE timestamp = ?",
+                    (timestamp,)
+                ).fetchone()
+                self._conn.execute(f"DELETE FROM {self.name} WHERE timestamp = ?", (timestamp,))
+            self._keys.popleft()
+            self._publish()
+        return self._to_dict(row) if row else None
+
+    def dates(self):
+        """获取所有有记录的日期 (YYYYMMDD)，倒序"""
+        rows = self._reader().execute(
+            f"SELECT DISTINCT substr(timestamp, 1, 8) FROM {self.name} ORDER BY 1 DESC"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self):
+        return len(self._snapshot)
+
+
+def scan_directory(directory, pattern):
+    """
+    一次性扫描目录，逐个产出 (文件名中的时间戳, 文件名)。
+    使用 os.scandir 流式遍历，不构建完整列表也不排序。
+    """
+    regex = re.compile(pattern)
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                match = regex.fullmatch(entry.name)
+                if match and entry.is_file():
+                    yield match.group(1), entry.name
+    except FileNotFoundError:
+        return
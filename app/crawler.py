@@ -0,0 +1,101 @@
+"""
+抓取模式的持久化索引
+
+保存每个主题已归档的版本（主题ID + 最后一个帖子的编号），服务重启后仍然有效。
+每次拿到最新的主题列表后与之对比，只有新主题或有新回复的主题需要重新抓取。
+同一个主题的每个版本各保存一行，构成完整的归档历史。
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+class CrawlIndex:
+    """已抓取主题集合 + 主题归档索引"""
+
+    def __init__(self, db_path, name="crawl_topics"):
+        self.db_path = Path(db_path)
+        self.name = name
+        self._lock = threading.Lock()
+        self._seen = {}  # 主题ID -> 已归档的最大帖子编号
+        self._in_flight = set()  # 已分配给工作线程、尚未完成的主题
+        self.archived = 0
+        self.failed = 0
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                f"topic_id INTEGER, highest_post_number INTEGER, last_posted_at TEXT, "
+                f"title TEXT, filename TEXT, fetched_at TEXT, "
+                f"PRIMARY KEY (topic_id, highest_post_number)) WITHOUT ROWID"
+            )
+        rows = self._conn.execute(
+            f"SELECT topic_id, MAX(highest_post_number) FROM {self.name} GROUP BY topic_id"
+        )
+        self._seen = {topic_id: number for topic_id, number in rows}
+
+    def claim_changed(self, topics, limit=None):
+        """
+        从主题列表中挑出新主题或有新回复的主题，标记为处理中并返回。
+        topics: 主题列表中的字典（需要 id 和 highest_post_number）
+        """
+        claimed = []
+        with self._lock:
+            for topic in topics:
+                topic_id = topic.get("id")
+                number = topic.get("highest_post_number") or 0
+                if not topic_id or topic_id in self._in_flight:
+                    continue
+                if self._seen.get(topic_id, -1) >= number:
+                    continue
+                self._in_flight.add(topic_id)
+                claimed.append(topic)
+                if limit and len(claimed) >= limit:
+                    break
+        return claimed
+
+    def record(self, topic_id, highest_post_number, last_posted_at, title, filename):
+        """记录一次成功的归档"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.name} VALUES (?, ?, ?, ?, ?, ?)",
+                (topic_id, highest_post_number, last_posted_at, title, filename,
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            self._seen[topic_id] = max(self._seen.get(topic_id, -1), highest_post_number)
+            self._in_flight.discard(topic_id)
+            self.archived += 1
+
+    def release(self, topic_id, failed=True):
+        """释放未能归档的主题（抓取失败或队列已满），下次对比时重新尝试"""
+        with self._lock:
+            self._in_flight.discard(topic_id)
+            if failed:
+                self.failed += 1
+
+    def latest(self, topic_id):
+        """获取主题最新的归档记录"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT topic_id, highest_post_number, last_posted_at, title, filename, fetched_at "
+                f"FROM {self.name} WHERE topic_id = ? ORDER BY highest_post_number DESC LIMIT 1",
+                (topic_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("topic_id", "highest_post_number", "last_posted_at", "title", "filename", "fetched_at"), row))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "topics": len(self._seen),
+                "in_flight": len(self._in_flight),
+                "archived": self.archived,
+                "failed": self.failed,
+            }
@@ -0,0 +1,170 @@
+"""
+关键帧 + 分块差异存储
+
+每隔 keyframe_interval 帧保存一张完整的关键帧，其余帧只保存与关键帧相比发生变化的图块。
+变化的图块按网格拼接成一张 PNG（图块图集），位置信息保存在索引中。
+读取时用关键帧加上图块图集即可还原任意一帧，解码后的关键帧保存在 LRU 缓存中。
+"""
+import io
+import math
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageChops
+
+
+def changed_tiles(base, image, tile_size):
+    """返回 image 与 base 相比发生变化的图块列表 [[x, y, w, h], ...]"""
+    if base.mode != image.mode:
+        image = image.convert(base.mode)
+    diff = ImageChops.difference(base, image)
+    bbox = diff.getbbox()
+    if not bbox:
+        return []
+    width, height = image.size
+    tiles = []
+    for y in range(bbox[1] // tile_size * tile_size, bbox[3], tile_size):
+        for x in range(bbox[0] // tile_size * tile_size, bbox[2], tile_size):
+            box = (x, y, min(x + tile_size, width), min(y + tile_size, height))
+            if diff.crop(box).getbbox():
+                tiles.append([box[0], box[1], box[2] - box[0], box[3] - box[1]])
+    return tiles
+
+
+def _atlas_position(index, columns, tile_size):
+    """第 index 个图块在图集中的左上角坐标"""
+    return (index % columns) * tile_size, (index // columns) * tile_size
+
+
+def build_atlas(image, tiles, tile_size):
+    """把变化的图块按网格拼接成一张图集"""
+    columns = max(1, math.ceil(math.sqrt(len(tiles))))
+    rows = max(1, math.ceil(len(tiles) / columns))
+    atlas = Image.new(image.mode, (columns * tile_size, rows * tile_size))
+    for index, (x, y, w, h) in enumerate(tiles):
+        atlas.paste(image.crop((x, y, x + w, y + h)), _atlas_position(index, columns, tile_size))
+    return atlas
+
+
+def save_delta(image, tiles, tile_size, path):
+    """
+    保存差异帧的图块图集（始终使用无损PNG，避免误差累积）。
+    该函数是模块级函数，可以直接提交到进程池中执行。
+    """
+    build_atlas(image, tiles, tile_size).save(path, format="PNG", compress_level=6)
+    return str(path)
+
+
+def apply_atlas(keyframe, atlas, tiles, tile_size):
+    """将图集中的图块贴回关键帧副本，还原出完整的帧"""
+    frame = keyframe.copy()
+    columns = max(1, math.ceil(math.sqrt(len(tiles))))
+    if atlas.mode != frame.mode:
+        atlas = atlas.convert(frame.mode)
+    for index, (x, y, w, h) in enumerate(tiles):
+        left, top = _atlas_position(index, columns, tile_size)
+        frame.paste(atlas.crop((left, top, left + w, top + h)), (x, y))
+    return frame
+
+
+class DeltaEncoder:
+    """
+    决定每一帧保存为关键帧还是差异帧。
+    需要按时间顺序调用 plan()，因此应在单线程的流水线阶段中使用。
+    """
+
+    def __init__(self, keyframe_interval=30, tile_size=64, max_changed_ratio=0.5):
+        self.keyframe_interval = keyframe_interval
+        self.tile_size = tile_size
+        self.max_changed_ratio = max_changed_ratio
+        self._lock = threading.Lock()
+        self._keyframe = None
+        self._keyframe_filename = None
+        self._since_keyframe = 0
+        self.keyframes = 0
+        self.deltas = 0
+
+    def plan(self, image, keyframe_filename, delta_filename):
+        """
+        返回本帧的存储方案：
+        关键帧 {"filename": keyframe_filename, "keyframe": None, "tiles": None}
+        差异帧 {"filename": delta_filename, "keyframe": 关键帧文件名, "tiles": [...]}
+        """
+        with self._lock:
+            if (self._keyframe is not None
+                    and self._since_keyframe < self.keyframe_interval
+                    and self._keyframe.size == image.size):
+                tiles = changed_tiles(self._keyframe, image, self.tile_size)
+                changed_area = sum(w * h for _, _, w, h in tiles)
+                if changed_area <= self.max_changed_ratio * image.width * image.height:
+                    self._since_keyframe += 1
+                    self.deltas += 1
+                    return {"filename": delta_filename, "keyframe": self._keyframe_filename, "tiles": tiles}
+
+            # 变化过大、间隔已满或分辨率变化时，保存新的关键帧
+            self._keyframe = image
+            self._keyframe_filename = keyframe_filename
+            self._since_keyframe = 1
+            self.keyframes += 1
+            return {"filename": keyframe_filename, "keyframe": None, "tiles": None}
+
+    def reset(self):
+        """丢弃当前关键帧（例如关键帧保存失败时），下一帧将成为新的关键帧"""
+        with self._lock:
+            self._keyframe = None
+            self._keyframe_filename = None
+            self._since_keyframe = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "keyframe_interval": self.keyframe_interval,
+                "tile_size": self.tile_size,
+                "keyframes": self.keyframes,
+                "deltas": self.deltas,
+                "current_keyframe": self._keyframe_filename,
+            }
+
+
+class KeyframeCache:
+    """已解码关键帧的 LRU 缓存，避免每次还原差异帧都重新解码关键帧"""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        key = str(path)
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        with Image.open(path) as img:
+            img.load()
+            image = img.copy()
+        with self._lock:
+            self._items[key] = image
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+def reconstruct_frame(keyframe_path, delta_path, tiles, tile_size, cache):
+    """还原差异帧，返回PNG字节"""
+    keyframe = cache.get(keyframe_path)
+    with Image.open(delta_path) as atlas:
+        frame = apply_atlas(keyframe, atlas, tiles, tile_size)
+    buffer = io.BytesIO()
+    frame.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
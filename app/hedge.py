@@ -0,0 +1,115 @@
+"""
+并发抓取策略执行器
+
+按优先级排列的多个抓取策略错开启动（对冲请求）：第 i 个策略在 i * hedge_delay 秒后启动，
+前面的策略失败时立即启动下一个。优先采用优先级最高的成功结果，
+到达截止时间后不再等待，其余策略通过取消标志在下一次请求前退出。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+_local = threading.local()
+
+
+def is_cancelled():
+    """当前线程所属的策略是否已被取消（在发送每个请求前检查）"""
+    event = getattr(_local, "cancel_event", None)
+    return event is not None and event.is_set()
+
+
+def _run_strategy(func, cancel_event):
+    _local.cancel_event = cancel_event
+    try:
+        return func()
+    finally:
+        _local.cancel_event = None
+
+
+class StrategyExecutor:
+    """对冲执行多个返回 (content, success) 的抓取策略"""
+
+    def __init__(self, max_workers=8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch-strategy")
+
+    def run(self, strategies, deadline=60, hedge_delay=3, priority_grace=2):
+        """
+        strategies: [(名称, 函数)]，按优先级从高到低排列
+        deadline: 整体截止时间（秒）
+        hedge_delay: 相邻策略的错开启动间隔（秒）
+        priority_grace: 低优先级策略先成功时，等待更高优先级策略的最长时间（秒）
+        返回 (content, success, 策略名称)
+        """
+        started_at = time.monotonic()
+        end_at = started_at + deadline
+        cancel_event = threading.Event()
+        futures = {}  # future -> 优先级下标
+        results = {}  # 优先级下标 -> content
+        failed = set()
+        next_index = 0
+        accept_by = None  # 已有成功结果时，最晚在此时间返回
+
+        try:
+            while True:
+                now = time.monotonic()
+                # 启动到期的策略；所有已启动的策略都失败时立即启动下一个
+                while next_index < len(strategies) and (
+                    now >= started_at + next_index * hedge_delay
+                    or len(failed) == next_index
+                ):
+                    name, func = strategies[next_index]
+                    print(f"启动抓取策略: {name}")
+                    future = self._pool.submit(_run_strategy, func, cancel_event)
+                    futures[future] = next_index
+                    next_index += 1
+
+                # 当前最优的成功结果：优先级更高的策略都已失败时直接采用
+                if results:
+                    best = min(results)
+                    if all(i in failed for i in range(best)):
+                        return results[best], True, strategies[best][0]
+                    if accept_by is None:
+                        accept_by = now + priority_grace
+                    if now >= accept_by:
+                        return results[best], True, strategies[best][0]
+
+                if len(failed) == len(strategies) or now >= end_at:
+                    break
+
+                # 等待下一个事件：某个策略完成、下一个策略到期、宽限期或截止时间到达
+                wake_at = end_at
+                if next_index < len(strategies):
+                    wake_at = min(wake_at, started_at + next_index * hedge_delay)
+                if accept_by is not None:
+                    wake_at = min(wake_at, accept_by)
+                pending = [f for f in futures if not f.done()]
+                timeout = max(0.0, wake_at - time.monotonic())
+                if pending:
+                    wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(timeout)
+
+                for future in [f for f in futures if f.done()]:
+                    index = futures.pop(future)
+                    try:
+                        content, success = future.result()
+                    except Exception as e:
+                        print(f"抓取策略 {strategies[index][0]} 出错: {e}")
+                        content, success = None, False
+                    if success and content:
+                        results[index] = content
+                    else:
+                        failed.add(index)
+
+            if results:
+                best = min(results)
+                return results[best], True, strategies[best][0]
+            if time.monotonic() >= end_at:
+                print(f"抓取超过截止时间 {deadline} 秒")
+            return None, False, None
+        finally:
+            # 取消仍在运行的策略
+            cancel_event.set()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
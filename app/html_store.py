@@ -0,0 +1,171 @@
+"""
+按内容寻址的HTML快照存储
+
+每次抓取得到的页面先做归一化（去掉"抓取时间"等每次都会变化的字段），再计算 SHA-256，
+以哈希值命名文件。内容相同的页面只写入一次，各时刻的索引记录指向同一个文件。
+
+页面压缩后保存（gzip，安装了 brotli / zstandard 时可选 br / zstd），
+客户端支持该编码时直接发送磁盘上的压缩字节，不做任何重新压缩。
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 生成页面中每次都不同、但不代表内容变化的字段
+VOLATILE_PATTERNS = (
+    r"(?:抓取时间|截图时间): \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}",
+)
+
+# 支持的压缩格式：{名称: (文件扩展名, 默认压缩级别)}，名称即 HTTP Content-Encoding
+COMPRESSIONS = {
+    "gzip": (".gz", 9),
+    "br": (".br", 9),
+    "zstd": (".zst", 19),
+}
+
+# 扩展名 -> Content-Encoding
+CONTENT_ENCODINGS = {extension: name for name, (extension, _) in COMPRESSIONS.items()}
+
+
+def compression_available(name):
+    """检查压缩格式所需的模块是否已安装"""
+    if name == "br":
+        return brotli is not None
+    if name == "zstd":
+        return zstandard is not None
+    return name == "gzip"
+
+
+def compress(data, name, level=None):
+    """按指定格式压缩"""
+    level = COMPRESSIONS[name][1] if level is None else level
+    if name == "br":
+        return brotli.compress(data, quality=level)
+    if name == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress(data, encoding):
+    """按 Content-Encoding 解压，encoding 为 None 时原样返回"""
+    if encoding == "br":
+        return brotli.decompress(data)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=64 * 1024 * 1024)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+def content_encoding_for(filename):
+    """根据文件扩展名返回页面文件的 Content-Encoding，未压缩的文件返回 None"""
+    return CONTENT_ENCODINGS.get(os.path.splitext(str(filename))[1])
+
+
+def accepts_encoding(accept_encoding, encoding):
+    """客户端的 Accept-Encoding 是否接受该编码（q=0 表示不接受）"""
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() not in (encoding, "*"):
+            continue
+        params = params.replace(" ", "")
+        if not params.startswith("q="):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+class HtmlStore:
+    """
+    内容寻址的HTML文件存储，文件名为 page_{哈希}.html{压缩扩展名}。
+    compression 为 None 时不压缩。
+    """
+
+    def __init__(self, directory, compression="gzip", level=None, volatile_patterns=VOLATILE_PATTERNS):
+        self.directory = directory
+        self.compression = compression
+        self.level = level
+        self._volatile = [re.compile(pattern.encode("utf-8")) for pattern in volatile_patterns]
+        self._lock = threading.Lock()
+        self.written = 0
+        self.skipped = 0
+        self.bytes_skipped = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+    def normalize(self, content):
+        """去掉易变字段，得到用于计算哈希的内容"""
+        for pattern in self._volatile:
+            content = pattern.sub(b"", content)
+        return content
+
+    def filename_for(self, content):
+        """内容对应的文件名"""
+        digest = hashlib.sha256(self.normalize(content)).hexdigest()
+        extension = COMPRESSIONS[self.compression][0] if self.compression else ""
+        return f"page_{digest[:32]}.html{extension}"
+
+    def put(self, content):
+        """
+        保存页面，返回 (文件名, 是否新写入)。
+        相同内容的文件已存在时不再写入；新文件先写临时文件再重命名，不会留下半个文件。
+        """
+        filename = self.filename_for(content)
+        path = os.path.join(self.directory, filename)
+        if os.path.exists(path):
+            with self._lock:
+                self.skipped += 1
+                self.bytes_skipped += len(content)
+            return filename, False
+        # 压缩在锁外进行，只有写入和计数需要加锁
+        data = compress(content, self.compression, self.level) if self.compression else content
+        with self._lock:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.written += 1
+            self.bytes_raw += len(content)
+            self.bytes_stored += len(data)
+        return filename, True
+
+    def read(self, filename):
+        """读取页面并解压，返回原始HTML字节"""
+        with open(os.path.join(self.directory, filename), "rb") as f:
+            return decompress(f.read(), content_encoding_for(filename))
+
+    def remove(self, filename):
+        """删除页面文件（由调用方确认已无记录引用）"""
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        with self._lock:
+            total = self.written + self.skipped
+            return {
+                "written": self.written,
+                "skipped": self.skipped,
+                "bytes_skipped": self.bytes_skipped,
+                "hit_rate": round(self.skipped / total, 4) if total else 0.0,
+                "compression": self.compression,
+                "bytes_raw": self.bytes_raw,
+                "bytes_stored": self.bytes_stored,
+                "compression_ratio": round(self.bytes_raw / self.bytes_stored, 2) if self.bytes_stored else None,
+            }
@@ -0,0 +1,343 @@
+"""
+共享的HTTP抓取客户端
+
+所有网页抓取请求共用同一组连接池（每个代理一个），保持 keep-alive，
+避免每次请求都重新进行 TCP + TLS 握手。安装了 httpx 和 h2 时使用 HTTP/2，
+否则使用 requests 的连接池。每个主机的并发连接数受 max_per_host 限制。
+
+ValidatorCache 在连接池之上实现条件请求 (ETag / Last-Modified)，内容未变化时只需几百字节。
+HostRateLimiter 限制每个主机的请求速率，用于批量抓取。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTP2_AVAILABLE = False
+
+
+class FetchClient:
+    """线程安全的共享HTTP客户端"""
+
+    def __init__(self, cookies=None, max_per_host=4, timeout=30, http2=True, connect_timeout=None):
+        self.cookies = dict(cookies or {})
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        # 建立连接的超时单独设置得更短，无法连接的代理可以很快失败并切换到下一个
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._clients = {}  # 代理 -> 会话
+        self._host_slots = {}  # 主机 -> 信号量
+        self._lock = threading.Lock()
+
+    def _create_client(self, proxy):
+        """为指定代理创建会话（连接池）"""
+        if self.http2:
+            return httpx.Client(
+                http2=True,
+                proxy=proxy,
+                cookies=self.cookies,
+                follow_redirects=True,
+                timeout=self._timeout(None),
+                limits=httpx.Limits(max_keepalive_connections=self.max_per_host * 4),
+            )
+        session = requests.Session()
+        session.cookies.update(self.cookies)
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.max_per_host)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if proxy:
+            session.proxies = {"http": proxy, "https": proxy}
+        return session
+
+    def _timeout(self, timeout):
+        """转换为 httpx / requests 的超时参数（连接超时 + 读取超时）"""
+        timeout = timeout or self.timeout
+        if not self.connect_timeout:
+            return timeout
+        connect = min(self.connect_timeout, timeout)
+        if self.http2:
+            return httpx.Timeout(timeout, connect=connect)
+        return (connect, timeout)
+
+    def _client(self, proxy):
+        with self._lock:
+            client = self._clients.get(proxy)
+            if client is None:
+                client = self._create_client(proxy)
+                self._clients[proxy] = client
+            return client
+
+    def _host_slot(self, url):
+        """每个主机一个信号量，限制并发连接数"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def request(self, method, url, headers=None, params=None, json=None, proxy=None, timeout=None):
+        """发送请求，返回响应对象（支持 .status_code / .text / .json() / .headers）"""
+        client = self._client(proxy)
+        with self._host_slot(url):
+            return client.request(
+                method.upper(),
+                url,
+                headers=headers,
+                params=params,
+                json=json,
+                timeout=self._timeout(timeout),
+            )
+
+    @contextmanager
+    def stream(self, method, url, headers=None, params=None, proxy=None, timeout=None, chunk_size=16384):
+        """
+        流式请求，产出 (响应, 字节块迭代器)。响应体在迭代时才从网络读取，
+        提前退出 with 块即停止接收剩余内容。
+        """
+        client = self._client(proxy)
+        timeout = self._timeout(timeout)
+        with self._host_slot(url):
+            if self.http2:
+                with client.stream(method.upper(), url, headers=headers, params=params, timeout=timeout) as response:
+                    yield response, response.iter_bytes(chunk_size)
+                return
+            response = client.request(
+                method.upper(), url, headers=headers, params=params, timeout=timeout, stream=True
+            )
+            try:
+                yield response, response.iter_content(chunk_size)
+            finally:
+                response.close()
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+class HostRateLimiter:
+    """
+    每个主机的请求速率限制（GCRA 令牌桶）：平均每秒最多 rate 个请求，允许 burst 个突发。
+    acquire() 在锁内预约发送时间，在锁外等待，多个线程按预约顺序依次发出请求。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self._tat = {}  # 主机 -> 理论上下一个请求的到达时间
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, url):
+        """等待直到可以向该URL所在的主机发送请求，返回等待的秒数"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat.get(host, now), now)
+            delay = max(0.0, tat - self.tolerance - now)
+            self._tat[host] = tat + self.interval
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {"rate": round(1.0 / self.interval, 3), "hosts": len(self._tat), "waited_seconds": round(self.waited, 3)}
+
+
+class CachedResponse:
+    """
+    验证器缓存中的响应，接口与 requests/httpx 的响应一致。
+    not_modified 为 True 表示服务器返回了 304，内容来自缓存。
+    """
+
+    status_code = 200
+
+    def __init__(self, entry, not_modified):
+        self.entry = entry
+        self.not_modified = not_modified
+        self.headers = entry["headers"]
+
+    @property
+    def text(self):
+        return self.entry["text"]
+
+    @property
+    def content(self):
+        return self.entry["content"]
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def _recorded(chunks, received):
+    """边产出字节块边记录到 received"""
+    for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+
+
+class ValidatorCache:
+    """
+    基于 ETag / Last-Modified 的条件请求缓存。
+    保存每个 URL 最近一次 200 响应的内容和验证器，下次请求时带上 If-None-Match / If-Modified-Since；
+    服务器返回 304 时复用缓存内容，并可以复用上次基于该内容解析、渲染得到的结果。
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.modified = 0
+        self.memo_hits = 0
+
+    @staticmethod
+    def key(url, params=None):
+        """缓存键：URL + 排序后的查询参数"""
+        if not params:
+            return url
+        return url + "?" + urlencode(sorted(params.items()))
+
+    def conditional_headers(self, key):
+        """返回需要附加到请求上的条件请求头"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return {}
+            headers = {}
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+
+    def wrap(self, key, response):
+        """处理响应：304 时返回缓存内容，200 且带验证器时更新缓存"""
+        with self._lock:
+            if response.status_code == 304:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.not_modified += 1
+                    return CachedResponse(entry, True)
+                return response
+
+            if response.status_code != 200:
+                return response
+            if not response.headers.get("ETag") and not response.headers.get("Last-Modified"):
+                self._entries.pop(key, None)
+                return response
+
+        entry = self.store(key, response.headers, response.content, response.text)
+        return CachedResponse(entry, False) if entry else response
+
+    def store(self, key, headers, content, text=None):
+        """
+        保存一次完整的 200 响应（流式读取完毕后也可直接调用），返回缓存条目；
+        响应没有验证器时不缓存，返回 None。
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        with self._lock:
+            if not etag and not last_modified:
+                self._entries.pop(key, None)
+                return None
+
+            self.modified += 1
+            entry = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "text": text if text is not None else content.decode("utf-8", "replace"),
+                "content": content,
+                "headers": dict(headers),
+                "memo": {},
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    @contextmanager
+    def stream(self, key, response, chunks):
+        """
+        包装流式响应，产出 (响应, 字节块迭代器, 已读取内容列表)。
+        304 且有缓存时产出缓存内容，响应为 not_modified 的 CachedResponse；
+        200 时立即根据响应头保存验证器，调用方只读取部分内容（例如只需要前几个条目）
+        下次也能发出条件请求，退出时再把已读取的内容写入缓存。
+        带验证器的 200 响应产出 CachedResponse，可以配合 memo 缓存解析结果。
+        """
+        if response.status_code == 304:
+            cached = self.wrap(key, response)
+            if cached is not response:
+                yield cached, iter([cached.content]), [cached.content]
+                return
+        if response.status_code != 200:
+            yield response, iter(()), []
+            return
+
+        received = []
+        entry = self.store(key, response.headers, b"")
+        try:
+            yield (CachedResponse(entry, False) if entry else response), _recorded(chunks, received), received
+        except Exception:
+            # 读取失败时不保留验证器，否则下次 304 会复用不完整的内容
+            if entry is not None:
+                self.discard(key, entry)
+            raise
+        if entry is not None:
+            content = b"".join(received)
+            with self._lock:
+                entry["content"] = content
+                entry["text"] = content.decode("utf-8", "replace")
+
+    def discard(self, key, entry=None):
+        """移除缓存条目；指定 entry 时只在该条目仍是当前条目时移除"""
+        with self._lock:
+            if entry is None or self._entries.get(key) is entry:
+                self._entries.pop(key, None)
+
+    def memo(self, response, name, builder):
+        """
+        内容未变化 (304) 时直接返回上次基于同一内容生成的结果，跳过解析和渲染；
+        否则调用 builder() 重新生成并缓存。
+        """
+        if not isinstance(response, CachedResponse):
+            return builder()
+        memo = response.entry["memo"]
+        with self._lock:
+            if response.not_modified and name in memo:
+                self.memo_hits += 1
+                return memo[name]
+        value = builder()
+        with self._lock:
+            memo[name] = value
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "not_modified": self.not_modified,
+                "modified": self.modified,
+                "memo_hits": self.memo_hits,
+            }
@@ -0,0 +1,201 @@
+"""
+截图图像处理：缩略图生成、编码格式、重复帧检测
+"""
+import os
+import threading
+
+from PIL import Image, features
+
+# 支持的截图保存格式：{名称: (Pillow格式, 扩展名, MIME类型)}
+IMAGE_FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "webp": ("WEBP", "webp", "image/webp"),  # 无损 WebP
+    "webp_lossy": ("WEBP", "webp", "image/webp"),  # 有损 WebP
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "avif": ("AVIF", "avif", "image/avif"),
+}
+
+# 各格式的默认编码参数，会被调用方传入的参数覆盖
+DEFAULT_ENCODE_OPTIONS = {
+    "png": {"compress_level": 6, "optimize": False},
+    "webp": {"lossless": True, "quality": 20, "method": 1},  # 无损模式下 quality 表示压缩力度
+    "webp_lossy": {"lossless": False, "quality": 80, "method": 4},
+    "jpeg": {"quality": 85, "optimize": True},
+    "avif": {"quality": 60, "speed": 8},
+}
+
+# 扩展名 -> MIME类型
+MEDIA_TYPES = {extension: media_type for _, extension, media_type in IMAGE_FORMATS.values()}
+
+
+def format_available(name):
+    """检查当前 Pillow 是否支持该格式的编码"""
+    if name not in IMAGE_FORMATS:
+        return False
+    if name.startswith("webp"):
+        return features.check("webp")
+    if name == "avif":
+        return "avif" in features.modules and bool(features.check_module("avif"))
+    return True
+
+
+def format_extension(name):
+    """格式对应的文件扩展名"""
+    return IMAGE_FORMATS[name][1]
+
+
+def media_type_for(filename):
+    """根据文件扩展名返回 MIME 类型"""
+    extension = str(filename).rsplit(".", 1)[-1].lower()
+    return MEDIA_TYPES.get(extension, "application/octet-stream")
+
+
+def save_image(image, path, name, options=None):
+    """
+    按指定格式编码并保存图像。
+    该函数是模块级函数，可以直接提交到进程池中执行。
+    """
+    pil_format = IMAGE_FORMATS[name][0]
+    params = dict(DEFAULT_ENCODE_OPTIONS.get(name, {}))
+    params.update(options or {})
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(path, format=pil_format, **params)
+    return str(path)
+
+
+def encode_frames(frames, name, options=None):
+    """
+    成批编码原始像素帧并保存。frames: [(像素数据, (宽, 高), 原始像素格式, 路径)]
+    该函数是模块级函数，可以直接提交到进程池中执行，一批帧只需一次进程间往返。
+    """
+    for data, size, raw_mode, path in frames:
+        image = Image.frombuffer("RGB", size, data, "raw", raw_mode, 0, 1)
+        save_image(image, path, name, options)
+
+
+def fit_size(width, height, max_size):
+    """按比例缩放到不超过 max_size 的尺寸（与 Image.thumbnail 的规则一致，不放大）"""
+    max_width, max_height = max_size
+    scale = min(max_width / width, max_height / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def fast_downscale(image, max_size):
+    """
+    快速缩小图像。
+    reducing_gap 会先用 Image.reduce 做整数倍盒式缩小，再对小图做双线性插值，
+    比直接对全分辨率图像做插值快得多。
+    """
+    target = fit_size(image.width, image.height, max_size)
+    if target == image.size:
+        return image.copy()
+    return image.resize(target, Image.BILINEAR, reducing_gap=2.0)
+
+
+def make_thumbnails(image, sizes):
+    """
+    从内存中的截图生成多个尺寸的缩略图。
+    只对原图做一次缩小（缩小到最大的尺寸），更小的尺寸在上一级结果上继续缩小。
+
+    sizes: {名称: (最大宽, 最大高)}
+    返回: {名称: Image}
+    """
+    ordered = sorted(sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True)
+    results = {}
+    source = image
+    for name, max_size in ordered:
+        source = fast_downscale(source, max_size)
+        results[name] = source
+    return results
+
+
+def save_thumbnails(image, sizes, directory, timestamp):
+    """
+    生成并保存所有尺寸的缩略图，文件名为 {名称}_{timestamp}.png。
+    该函数是模块级函数，可以直接提交到进程池中执行。
+    """
+    for name, thumb in make_thumbnails(image, sizes).items():
+        thumb.save(os.path.join(directory, f"{name}_{timestamp}.png"))
+
+
+def perceptual_hash(image, hash_size=16):
+    """
+    计算帧签名：缩小为 (hash_size+1) x hash_size 的灰度图，
+    返回 (差值哈希 dHash, 各块平均亮度)。
+    dHash 比较每行相邻像素的明暗，得到 hash_size*hash_size 位的整数，对结构变化敏感；
+    块平均亮度用于发现 dHash 察觉不到的整体亮度/颜色变化。
+    """
+    small = image.resize((hash_size + 1, hash_size), Image.BOX, reducing_gap=2.0).convert("L")
+    pixels = small.tobytes()
+    width = hash_size + 1
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value, pixels
+
+
+def hamming_distance(a, b):
+    """两个哈希值不同的位数"""
+    return bin(a ^ b).count("1")
+
+
+def max_block_difference(a, b):
+    """两组块平均亮度之间的最大差值"""
+    return max((abs(x - y) for x, y in zip(a, b)), default=0)
+
+
+class FrameDeduplicator:
+    """
+    重复帧检测：与最近一次实际保存的帧比较感知哈希，
+    哈希差异不超过 threshold 位、且各块亮度差不超过 block_tolerance 时视为重复，
+    返回被引用帧的时间戳。
+    """
+
+    def __init__(self, hash_size=16, threshold=2, block_tolerance=8):
+        self.hash_size = hash_size
+        self.threshold = threshold
+        self.block_tolerance = block_tolerance
+        self._lock = threading.Lock()
+        self._last_hash = None
+        self._last_blocks = None
+        self._last_timestamp = None
+        self.checked = 0
+        self.duplicates = 0
+        self.last_distance = None
+
+    def check(self, image, timestamp):
+        """返回被引用帧的时间戳；不是重复帧时返回 None，并把当前帧记为新的参考帧"""
+        frame_hash, blocks = perceptual_hash(image, self.hash_size)
+        with self._lock:
+            self.checked += 1
+            if self._last_hash is not None:
+                self.last_distance = hamming_distance(frame_hash, self._last_hash)
+                if (self.last_distance <= self.threshold
+                        and max_block_difference(blocks, self._last_blocks) <= self.block_tolerance):
+                    self.duplicates += 1
+                    return self._last_timestamp
+            self._last_hash = frame_hash
+            self._last_blocks = blocks
+            self._last_timestamp = timestamp
+            return None
+
+    def reset(self):
+        """丢弃参考帧（例如参考帧保存失败时），下一帧将作为新的参考帧"""
+        with self._lock:
+            self._last_hash = None
+            self._last_blocks = None
+            self._last_timestamp = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "hit_rate": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+                "threshold": self.threshold,
+                "last_distance": self.last_distance,
+                "reference_timestamp": self._last_timestamp,
+            }
@@ -0,0 +1,142 @@
+"""
+截图流水线
+
+将一次截图拆分为若干独立阶段（抓屏 → 编码 → 缩略图 → 索引），
+每个阶段拥有自己的有界队列和工作线程。抓屏只负责把图像放进队列，
+编码或网络再慢也不会拖慢抓屏节奏。
+"""
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class Stage:
+    """流水线中的一个阶段：有界队列 + 若干工作线程"""
+
+    def __init__(self, name, handler, workers=1, maxsize=8):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.next_stage = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self._pending = 0  # 已接受、尚未处理完的任务数（排队中 + 处理中）
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_duration = None
+
+    def start(self):
+        """启动工作线程"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """通知所有工作线程退出"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        self._threads = []
+
+    def submit(self, item, block=False):
+        """
+        提交任务。默认非阻塞，队列已满时丢弃并计数；
+        阶段之间转发时使用阻塞方式，从而形成背压。
+        """
+        with self._stats_lock:
+            self._pending += 1
+        try:
+            self._queue.put(item, block=block)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._pending -= 1
+                self.dropped += 1
+            print(f"[{self.name}] 队列已满，丢弃任务")
+            return False
+
+    def submit_if_idle(self, item):
+        """
+        仅当有空闲的工作线程时提交，用于定时任务：上一次仍在排队或处理时丢弃本次并计数，
+        而不是排在它后面、紧接着再执行一次
+        """
+        with self._stats_lock:
+            if self._pending >= self.workers:
+                self.dropped += 1
+                print(f"[{self.name}] 上一次尚未完成，跳过本次")
+                return False
+            self._pending += 1
+        self._queue.put(item)
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            with self._stats_lock:
+                self._busy += 1
+            started = time.monotonic()
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                result = None
+                with self._stats_lock:
+                    self.errors += 1
+                print(f"[{self.name}] 处理失败: {e}")
+            else:
+                with self._stats_lock:
+                    self.processed += 1
+            finally:
+                with self._stats_lock:
+                    self._busy -= 1
+                    self._pending -= 1
+                    self.last_duration = time.monotonic() - started
+
+            if result is not None and self.next_stage is not None:
+                self.next_stage.submit(result, block=True)
+
+    def stats(self):
+        """阶段运行状态"""
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self.maxsize,
+                "workers": self.workers,
+                "busy": self._busy,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            }
+
+
+class Pipeline:
+    """按顺序串联多个阶段，前一阶段的返回值作为后一阶段的输入（返回 None 表示终止）"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        for current, following in zip(self.stages, self.stages[1:]):
+            current.next_stage = following
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def submit(self, item):
+        """向第一个阶段提交任务（非阻塞）"""
+        return self.stages[0].submit(item)
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
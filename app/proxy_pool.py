@@ -0,0 +1,177 @@
+"""
+代理池
+
+记录每个代理的请求延迟和错误率（指数加权移动平均），每个请求按评分从好到差依次尝试健康的代理，
+连接失败时立即换下一个，而不是每次都从列表第一个开始、逐个等待超时。
+连续失败 evict_after 次的代理被移出候选列表，由后台线程定期探测，恢复后重新加入；
+最近失败过的代理同样会被探测，以便恢复评分。
+所有代理都被移出时仍按评分依次尝试，保证请求不会因为代理池为空而直接失败。
+
+连接池由 FetchClient 按代理分别维护，代理池只负责选择代理。
+"""
+import re
+import threading
+import time
+
+HEALTHY = "healthy"
+EVICTED = "evicted"
+
+_CREDENTIALS = re.compile(r"//[^/@]+@")
+
+
+def display_name(proxy):
+    """代理的展示名称，隐藏其中的用户名和密码"""
+    if proxy is None:
+        return "direct"
+    return _CREDENTIALS.sub("//***@", proxy)
+
+
+class ProxyStats:
+    """单个代理的健康统计（由 ProxyPool 加锁访问）"""
+
+    def __init__(self, initial_latency):
+        self.state = HEALTHY
+        self.latency = initial_latency  # 延迟的移动平均（秒）
+        self.error_rate = 0.0  # 错误率的移动平均
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.evicted_at = None
+        self.last_probe = None
+
+
+class ProxyPool:
+    """
+    按健康评分选择代理。
+    alpha: 移动平均的权重；evict_after: 连续失败多少次后移出候选列表；
+    probe: 探测函数 probe(proxy) -> bool，由后台线程每 probe_interval 秒对被移出或最近失败的代理调用一次。
+    """
+
+    def __init__(self, proxies, probe=None, probe_interval=60, evict_after=2, alpha=0.3, initial_latency=1.0):
+        self.alpha = alpha
+        self.evict_after = evict_after
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self._proxies = {proxy: ProxyStats(initial_latency) for proxy in proxies}
+        self._order = list(proxies)  # 配置顺序，评分相同时保持
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.failovers = 0
+
+    def _score(self, stats):
+        """越小越好：延迟按错误率放大"""
+        return stats.latency * (1 + 4 * stats.error_rate)
+
+    def candidates(self):
+        """按评分从好到差排列的代理列表；健康的代理在前，被移出的代理排在最后"""
+        with self._lock:
+            ranked = sorted(
+                enumerate(self._order),
+                key=lambda item: (
+                    self._proxies[item[1]].state != HEALTHY,
+                    self._score(self._proxies[item[1]]),
+                    item[0],
+                )
+            )
+            return [proxy for _, proxy in ranked]
+
+    def record_success(self, proxy, latency):
+        """请求完成（收到响应），latency 为收到响应头的耗时（秒）"""
+        with self._lock:
+            stats = self._proxies.get(proxy)
+            if stats is None:
+                return
+            stats.requests += 1
+            stats.latency += self.alpha * (latency - stats.latency)
+            stats.error_rate -= self.alpha * stats.error_rate
+            stats.consecutive_failures = 0
+            if stats.state == EVICTED:
+                stats.state = HEALTHY
+                stats.evicted_at = None
+
+    def record_failure(self, proxy, evict=True):
+        """
+        请求失败。evict 为 False 表示代理本身可用但请求被拒绝（如被限流），
+        只影响评分，不会被移出候选列表。
+        """
+        with self._lock:
+            stats = self._proxies.get(proxy)
+            if stats is None:
+                return
+            stats.requests += 1
+            stats.failures += 1
+            stats.error_rate += self.alpha * (1 - stats.error_rate)
+            if not evict:
+                return
+            stats.consecutive_failures += 1
+            self.failovers += 1
+            if stats.state == HEALTHY and stats.consecutive_failures >= self.evict_after:
+                stats.state = EVICTED
+                stats.evicted_at = time.time()
+                print(f"代理 {display_name(proxy)} 连续失败 {stats.consecutive_failures} 次，移出候选列表")
+
+    def probe_evicted(self):
+        """
+        探测被移出和最近失败过的代理（后者不会再被优先选中，只能靠探测恢复评分），
+        恢复可用的代理，返回探测成功的数量
+        """
+        if self.probe is None:
+            return 0
+        with self._lock:
+            evicted = [
+                proxy for proxy, stats in self._proxies.items()
+                if stats.state == EVICTED or stats.consecutive_failures
+            ]
+        restored = 0
+        for proxy in evicted:
+            if self._stop.is_set():
+                break
+            started = time.monotonic()
+            try:
+                ok = self.probe(proxy)
+            except Exception:
+                ok = False
+            with self._lock:
+                self._proxies[proxy].last_probe = time.time()
+            if ok:
+                self.record_success(proxy, time.monotonic() - started)
+                print(f"代理 {display_name(proxy)} 探测成功")
+                restored += 1
+        return restored
+
+    def _run(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe_evicted()
+
+    def start(self):
+        """启动后台探测线程"""
+        if self._thread is None and self.probe is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="proxy-probe")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "failovers": self.failovers,
+                "proxies": [
+                    {
+                        "proxy": display_name(proxy),
+                        "state": stats.state,
+                        "latency_ms": round(stats.latency * 1000, 1),
+                        "error_rate": round(stats.error_rate, 4),
+                        "score": round(self._score(stats), 4),
+                        "consecutive_failures": stats.consecutive_failures,
+                        "requests": stats.requests,
+                        "failures": stats.failures,
+                        "evicted_at": (
+                            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stats.evicted_at))
+                            if stats.evicted_at else None
+                        ),
+                    }
+                    for proxy, stats in ((p, self._proxies[p]) for p in self._order)
+                ],
+            }
@@ -0,0 +1,192 @@
+"""
+增量RSS解析
+
+使用 XMLPullParser 逐块解析响应内容，每解析完一个 <item> 就立即产出，
+解析后的元素随即从树中移除，内存占用与条目数量无关；
+收集到足够的条目后调用方停止迭代，剩余内容不再下载和解析。
+
+运行 python -m app.rss 可以与原先基于正则表达式的解析方式做性能对比，
+并检查只读取前几个条目时条件请求缓存仍然生效。
+"""
+import re
+import time
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+DC_CREATOR = "{http://purl.org/dc/elements/1.1/}creator"
+
+
+def _child_text(element, tag):
+    child = element.find(tag)
+    if child is None or child.text is None:
+        return ""
+    return child.text.strip()
+
+
+def parse_item(element):
+    """将 <item> 元素转换为字典，description 为未经处理的HTML"""
+    return {
+        "title": _child_text(element, "title"),
+        "link": _child_text(element, "link"),
+        "date": _child_text(element, "pubDate"),
+        "description": _child_text(element, "description"),
+        "author": _child_text(element, DC_CREATOR),
+        "categories": [child.text.strip() for child in element.findall("category") if child.text],
+    }
+
+
+class RssStream:
+    """
+    从字节块迭代器中增量解析RSS，迭代时逐个产出条目字典。
+    channel_title 在解析到频道标题后可用；complete 表示整个文档已解析完毕，
+    error 为遇到格式错误时的异常（此前已产出的条目仍然有效）。
+    """
+
+    def __init__(self, chunks, max_items=None):
+        self.chunks = chunks
+        self.max_items = max_items
+        self.channel_title = None
+        self.complete = False
+        self.error = None
+
+    def __iter__(self):
+        parser = XMLPullParser(events=("start", "end"))
+        stack = []  # 当前打开的元素
+        count = 0
+        try:
+            for chunk in self.chunks:
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if event == "start":
+                        stack.append(element)
+                        continue
+                    stack.pop()
+                    parent = stack[-1] if stack else None
+                    if element.tag == "title" and parent is not None and parent.tag == "channel":
+                        if self.channel_title is None:
+                            self.channel_title = (element.text or "").strip()
+                    elif element.tag == "item":
+                        item = parse_item(element)
+                        # 已产出的条目从树中移除，避免整棵树常驻内存
+                        if parent is not None:
+                            parent.remove(element)
+                        yield item
+                        count += 1
+                        if self.max_items and count >= self.max_items:
+                            return
+            parser.close()
+            self.complete = True
+        except ParseError as e:
+            self.error = e
+
+
+def _regex_items(content):
+    """原先的解析方式：整篇文档读入后逐个正则匹配（仅用于性能对比）"""
+    items = []
+    for item in re.findall(r"<item>(.*?)</item>", content, re.DOTALL):
+        fields = {}
+        for name, pattern in (("title", r"<title>(.*?)</title>"), ("link", r"<link>(.*?)</link>"),
+                              ("date", r"<pubDate>(.*?)</pubDate>"),
+                              ("author", r"<dc:creator>(.*?)</dc:creator>")):
+            match = re.search(pattern, item, re.DOTALL)
+            fields[name] = match.group(1) if match else ""
+        match = re.search(r"<description>(.*?)</description>", item, re.DOTALL)
+        fields["description"] = re.sub(r"<!\[CDATA\[(.*?)\]\]>", r"\1", match.group(1)) if match else ""
+        fields["categories"] = re.findall(r"<category>(.*?)</category>", item)
+        items.append(fields)
+    return items
+
+
+def _sample_feed(item_count, body_size=2000):
+    """生成用于性能对比的RSS文档"""
+    body = "<p>" + "内容 content " * (body_size // 14) + "</p>"
+    items = "".join(
+        f"<item><title>Topic {i}</title><link>https://example.com/t/topic/{i}</link>"
+        f"<pubDate>Mon, 01 Jan 2024 00:00:00 +0000</pubDate>"
+        f"<dc:creator><![CDATA[user{i}]]></dc:creator><category>cat</category>"
+        f"<description><![CDATA[{body}]]></description></item>"
+        for i in range(item_count)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f"<channel><title>Example</title>{items}</channel></rss>"
+    ).encode("utf-8")
+
+
+def _benchmark():
+    chunk_size = 16384
+    for item_count in (30, 300, 3000):
+        data = _sample_feed(item_count)
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+        started = time.perf_counter()
+        regex_count = len(_regex_items(data.decode("utf-8")))
+        regex_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        stream_count = sum(1 for _ in RssStream(iter(chunks)))
+        stream_ms = (time.perf_counter() - started) * 1000
+
+        consumed = [0]
+
+        def counted():
+            for chunk in chunks:
+                consumed[0] += len(chunk)
+                yield chunk
+
+        started = time.perf_counter()
+        limited_count = sum(1 for _ in RssStream(counted(), max_items=30))
+        limited_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{item_count} 条 ({len(data) / 1024:.0f} KB): "
+              f"正则 {regex_ms:.1f} ms ({regex_count} 条), "
+              f"增量 {stream_ms:.1f} ms ({stream_count} 条), "
+              f"增量+前30条 {limited_ms:.1f} ms ({limited_count} 条, 读取 {consumed[0] / 1024:.0f} KB)")
+
+
+class _SampleResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+def _check_conditional(item_count=30, max_items=30, chunk_size=4096):
+    """
+    模拟两次抓取同一个带 ETag 的RSS：第一次读取到 max_items 个条目即停止，
+    第二次应带上 If-None-Match，服务器返回 304 后复用第一次解析出的条目。
+    """
+    from app.http_client import ValidatorCache
+
+    data = _sample_feed(item_count)
+    etag = '"sample-feed"'
+    cache = ValidatorCache()
+    key = cache.key("https://example.com/latest.rss")
+    sent = []
+    parsed = [0]
+
+    def fetch():
+        headers = cache.conditional_headers(key)
+        sent.append(headers)
+        if headers.get("If-None-Match") == etag:
+            response, chunks = _SampleResponse(304, {"ETag": etag}), iter(())
+        else:
+            response = _SampleResponse(200, {"ETag": etag})
+            chunks = iter([data[i:i + chunk_size] for i in range(0, len(data), chunk_size)])
+        with cache.stream(key, response, chunks) as (response, chunks, received):
+            def parse():
+                parsed[0] += 1
+                return list(RssStream(chunks, max_items=max_items))
+            return cache.memo(response, "rss_items", parse), sum(len(chunk) for chunk in received)
+
+    first, first_size = fetch()
+    second, _ = fetch()
+    assert "If-None-Match" not in sent[0]
+    assert sent[1].get("If-None-Match") == etag, "第二次请求没有带上 If-None-Match"
+    assert parsed[0] == 1 and second == first, "304 时没有复用已解析的条目"
+    print(f"条件请求: {item_count} 条的RSS第一次读取 {first_size / 1024:.0f} / {len(data) / 1024:.0f} KB，"
+          f"第二次带上 If-None-Match 并复用 {len(second)} 个条目")
+
+
+if __name__ == "__main__":
+    _benchmark()
+    _check_conditional()
@@ -0,0 +1,267 @@
+"""
+单遍HTML清理
+
+使用预编译的正则表达式做分词，对输入只扫描一遍：只保留白名单中的标签和属性，
+script/style/iframe 等标签连同内容一起丢弃，链接只允许 http/https/mailto 和相对地址，
+以 / 开头的相对地址补全为站点地址。所有查表使用预先构建的 frozenset，
+处理时间与输入长度成线性关系，不会因为未闭合的标签等异常输入而回溯。
+
+运行 python -m app.sanitize 可以在异常输入上做模糊测试，并与原先的多次正则替换做性能对比。
+"""
+import random
+import re
+import time
+from collections import Counter
+from html import escape, unescape
+
+# 允许保留的标签
+ALLOWED_TAGS = frozenset((
+    "a", "abbr", "aside", "b", "blockquote", "br", "code", "del", "details", "div", "em",
+    "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "img", "ins",
+    "kbd", "li", "mark", "ol", "p", "pre", "s", "small", "span", "strong", "sub", "summary",
+    "sup", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "u", "ul",
+))
+
+# 连同内容一起丢弃的标签
+DROP_CONTENT_TAGS = frozenset((
+    "script", "style", "iframe", "object", "embed", "noscript", "template",
+    "frame", "frameset", "svg", "math", "textarea", "select",
+))
+
+# 没有结束标签的元素
+VOID_TAGS = frozenset(("br", "hr", "img"))
+
+# 所有标签都允许的属性
+GLOBAL_ATTRIBUTES = frozenset(("class", "title", "lang", "dir"))
+
+# 各标签额外允许的属性
+TAG_ATTRIBUTES = {
+    "a": frozenset(("href", "rel", "target", "name")),
+    "img": frozenset(("src", "alt", "width", "height", "loading")),
+    "ol": frozenset(("start",)),
+    "td": frozenset(("colspan", "rowspan", "align")),
+    "th": frozenset(("colspan", "rowspan", "align")),
+    "details": frozenset(("open",)),
+}
+
+# 值为URL的属性
+URL_ATTRIBUTES = frozenset(("href", "src"))
+
+# 允许的URL协议，没有协议的相对地址始终允许
+ALLOWED_SCHEMES = frozenset(("http", "https", "mailto"))
+
+_SCHEME = re.compile(r"([a-zA-Z][a-zA-Z0-9+.\-]*):")
+_URL_IGNORED = re.compile(r"[\x00-\x20\x7f]+")
+_TAG_START = re.compile(r"<[a-zA-Z/!?]")
+_TAG_NAME = re.compile(r"(/?)([a-zA-Z][a-zA-Z0-9-]*)")
+# 未闭合的引号视为延伸到标签末尾，避免回溯
+_ATTRIBUTE = re.compile(r"""([^\s"'<>/=]+)(?:\s*=\s*(?:"([^"]*)"?|'([^']*)'?|([^\s>]+)))?""")
+_DROP_END = {tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE) for tag in DROP_CONTENT_TAGS}
+
+
+def _text(data):
+    """文本统一先解码字符引用再转义，输出中的 < 只可能来自白名单标签"""
+    if "&" in data:
+        data = unescape(data)
+    return escape(data, quote=False)
+
+
+def _clean_url(value, base_url):
+    """检查URL协议并补全相对地址，不安全时返回 None"""
+    # 浏览器会忽略URL中的空白和控制字符，检查协议前先去掉，防止 "java\tscript:" 之类的绕过
+    compact = _URL_IGNORED.sub("", value)
+    match = _SCHEME.match(compact)
+    if match:
+        return value.strip() if match.group(1).lower() in ALLOWED_SCHEMES else None
+    if compact.startswith("//"):
+        return "https:" + compact
+    if compact.startswith("/") and base_url:
+        return base_url + compact
+    return value.strip()
+
+
+def _start_tag(tag, body, base_url):
+    """输出白名单标签的开始标签，只保留允许的属性"""
+    allowed = TAG_ATTRIBUTES.get(tag, ())
+    seen = set()
+    parts = [f"<{tag}"]
+    for match in _ATTRIBUTE.finditer(body):
+        name = match.group(1).lower()
+        if name in seen or (name not in GLOBAL_ATTRIBUTES and name not in allowed) or name == "rel":
+            continue
+        seen.add(name)
+        value = match.group(2)
+        if value is None:
+            value = match.group(3)
+        if value is None:
+            value = match.group(4)
+        if value is None:
+            parts.append(f" {name}")
+            continue
+        if "&" in value:
+            value = unescape(value)
+        if name in URL_ATTRIBUTES:
+            value = _clean_url(value, base_url)
+            if value is None:
+                continue
+        parts.append(f' {name}="{escape(value, quote=True)}"')
+    if tag == "a":
+        parts.append(' rel="noopener noreferrer"')
+    parts.append(">")
+    return "".join(parts)
+
+
+def sanitize_html(content, base_url=""):
+    """
+    清理HTML片段，只保留白名单中的标签和属性；base_url 用于补全以 / 开头的相对地址。
+    每个字符最多被扫描常数次：标签以其后第一个 > 结束，> 的位置在多个 < 之间共享。
+    """
+    if not content:
+        return ""
+    base_url = base_url.rstrip("/")
+    out = []
+    open_tags = []  # 已输出、尚未闭合的标签
+    open_counts = Counter()  # 每种标签尚未闭合的数量，判断闭合标签是否有对应的开始标签时不扫描 open_tags
+    length = len(content)
+    pos = 0  # 尚未输出的文本的起点
+    scan = 0  # 查找下一个 < 的起点
+    gt = -1  # 下一个 > 的位置，length 表示之后没有 >
+    while True:
+        # 后面不是标签名的 < 直接跳过，作为文本的一部分稍后统一转义
+        start = _TAG_START.search(content, scan)
+        if start is None:
+            break
+        lt = start.start()
+        if content.startswith("<!--", lt):
+            if lt > pos:
+                out.append(_text(content[pos:lt]))
+            end = content.find("-->", lt + 4)
+            pos = scan = length if end < 0 else end + 3
+            continue
+
+        if gt <= lt:
+            gt = content.find(">", lt + 1)
+            if gt < 0:
+                gt = length
+        match = _TAG_NAME.match(content, lt + 1)
+        if not match and not content.startswith(("<!", "<?"), lt):
+            scan = lt + 1
+            continue
+        if lt > pos:
+            out.append(_text(content[pos:lt]))
+        if gt == length:
+            # 直到末尾都没有闭合的标签，浏览器会整体丢弃
+            pos = length
+            break
+        pos = scan = gt + 1
+        if not match:
+            # 文档类型声明、CDATA、处理指令：整体丢弃
+            continue
+
+        closing, tag = match.group(1), match.group(2).lower()
+        body = content[match.end():gt]
+        if closing:
+            if tag in ALLOWED_TAGS and open_counts[tag]:
+                # 闭合该标签以及其中尚未闭合的标签，保证输出的标签配对（每个标签只会被弹出一次）
+                while open_tags:
+                    open_tag = open_tags.pop()
+                    open_counts[open_tag] -= 1
+                    out.append(f"</{open_tag}>")
+                    if open_tag == tag:
+                        break
+            continue
+
+        self_closing = body.endswith("/")
+        if tag in DROP_CONTENT_TAGS:
+            if not self_closing:
+                end = _DROP_END[tag].search(content, pos)
+                pos = scan = length if end is None else end.end()
+            continue
+        if tag in ALLOWED_TAGS:
+            out.append(_start_tag(tag, body, base_url))
+            if tag not in VOID_TAGS:
+                if self_closing:
+                    out.append(f"</{tag}>")
+                else:
+                    open_tags.append(tag)
+                    open_counts[tag] += 1
+
+    if pos < length:
+        out.append(_text(content[pos:]))
+    out.extend(f"</{tag}>" for tag in reversed(open_tags))
+    return "".join(out)
+
+
+def _regex_clean_html(html_content, base_url=""):
+    """原先的清理方式：七次正则替换（仅用于性能对比）"""
+    html_content = re.sub(r'<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>', '', html_content)
+    html_content = re.sub(r'<style\b[^<]*(?:(?!<\/style>)<[^<]*)*<\/style>', '', html_content)
+    html_content = re.sub(r'<iframe\b[^<]*(?:(?!<\/iframe>)<[^<]*)*<\/iframe>', '', html_content)
+    html_content = re.sub(r'on\w+\s*=\s*["\'][^"\']*["\']', '', html_content)
+    html_content = re.sub(r'javascript:', 'void(0);', html_content)
+    html_content = re.sub(r'href=(["\'])/', f'href=\\1{base_url}/', html_content)
+    html_content = re.sub(r'src=(["\'])/', f'src=\\1{base_url}/', html_content)
+    return html_content
+
+
+# 模糊测试使用的片段
+_FUZZ_PIECES = (
+    "<script>", "</script>", "<style>", "</style>", "<iframe src=x>", "</iframe>", "<p>", "</p>",
+    "<a href=\"javascript:alert(1)\">", "<a href='/t/1'>", "</a>", "<img src=x onerror=alert(1)>",
+    "<img src=\"java\tscript:alert(1)\">", "<div onclick='x'>", "</div>", "<!--", "-->", "<![CDATA[",
+    "]]>", "&lt;", "&amp;", "&#x3c;script&#x3e;", "<", ">", "\"", "'", "=", "text ", "中文 ", "<svg><script>",
+    "</svg>", "<b>", "</i>", "<br/>", "<ScRiPt>", "</sCrIpT>", "<a href=\"&#106;avascript:x\">",
+)
+
+
+def _is_safe(output):
+    """检查清理结果的标签中不包含可执行内容（文本中的 < 已被转义，出现的 < 都是真正的标签）"""
+    for tag in re.findall(r"<(/?)([a-z0-9]+)([^>]*)>", output.lower()):
+        _, name, attributes = tag
+        if name not in ALLOWED_TAGS or "javascript:" in attributes or re.search(r"\son\w+\s*=", attributes):
+            return False
+    return "<" not in re.sub(r"<(/?)([a-z0-9]+)([^>]*)>", "", output)
+
+
+def _fuzz(rounds=2000, seed=0):
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        sample = "".join(rng.choice(_FUZZ_PIECES) for _ in range(rng.randint(1, 40)))
+        output = sanitize_html(sample, "https://example.com")
+        if not _is_safe(output):
+            raise AssertionError(f"清理结果不安全: {sample!r} -> {output!r}")
+    print(f"模糊测试: {rounds} 个随机输入全部通过")
+
+
+def _benchmark():
+    """
+    对比单遍清理与原先的正则替换。原先的 script/style 模式在未闭合的标签上是平方级的，
+    因此异常输入只用 32KB 运行正则替换，单遍清理使用 1MB。
+    """
+    size = 1024 * 1024
+    small = 32 * 1024
+    post = "<p>正常的帖子内容 <a href=\"/t/topic/1\">链接</a> <img src=\"/uploads/a.png\"></p>\n"
+    inputs = {
+        "普通帖子": (post * (size // len(post.encode("utf-8"))), size),
+        "未闭合的 <script": ("<script " * (size // 8), small),
+        "未闭合的 <style<": ("<style<" * (size // 7), small),
+        "大量事件属性": ("<div onclick='x' onmouseover=\"y\">" * (size // 34), size),
+        "连续的 <": ("<" * size, size),
+        "未闭合的引号": ("<a title=\"" * (size // 10) + ">", size),
+        "大量未匹配的闭合标签": ("<b>" * (size // 8) + "</i>" * (size // 8), size),
+    }
+    for name, (content, regex_size) in inputs.items():
+        started = time.perf_counter()
+        sanitize_html(content, "https://example.com")
+        single_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        _regex_clean_html(content[:regex_size], "https://example.com")
+        regex_ms = (time.perf_counter() - started) * 1000
+        print(f"{name}: 单遍清理 {len(content.encode('utf-8')) // 1024} KB {single_ms:.0f} ms, "
+              f"正则替换 {len(content[:regex_size].encode('utf-8')) // 1024} KB {regex_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    _fuzz()
+    _benchmark()
@@ -0,0 +1,206 @@
+"""
+受管理的调度器和执行器
+
+一个调度线程负责所有定时任务，到期的任务交给 I/O 线程池执行（抓屏、网页抓取、文件读写），
+CPU 密集的编码和缩略图生成交给进程池。进程池使用 forkserver（不支持时用 spawn）启动子进程，
+不从带有多个线程、锁和打开的连接的主进程直接 fork；在进程池中执行的函数须定义在可导入的模块中。
+异步接口通过 run_io() 把阻塞调用放到 I/O 线程池，不占用事件循环。
+
+定时任务按固定频率执行：第 k 次的到期时间为 起点 + k * interval（单调时钟），
+与任务本身的耗时无关，不会累积漂移；起点对齐到本地时间的整数倍（如间隔 60 秒时为每分钟的 :00）。
+每次执行记录相对到期时间的延迟；调度线程落后超过一个周期时跳过错过的周期并计数，
+到期时上一次仍在执行的同样跳过并计数，不会堆积。
+"""
+import asyncio
+import functools
+import heapq
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+
+def process_context():
+    """进程池的启动方式：forkserver，不支持时（如 Windows）使用 spawn"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def next_boundary(interval, align=True):
+    """距离下一个对齐时刻的秒数：本地时间（含时区偏移）为 interval 整数倍的时刻"""
+    if not align:
+        return interval
+    now = time.time()
+    local = now + datetime.fromtimestamp(now).astimezone().utcoffset().total_seconds()
+    return (-local) % interval
+
+
+class Job:
+    """一个定时任务"""
+
+    def __init__(self, name, interval, func, align):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.align = align
+        self.running = False
+        self.ticks = 0  # 已到期的周期数
+        self.runs = 0
+        self.missed = 0  # 调度线程落后而错过的周期数
+        self.skipped = 0  # 到期时上一次仍在执行而跳过的次数
+        self.errors = 0
+        self.last_duration = None
+        self.last_lateness = None
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+
+class Scheduler:
+    """
+    io_workers: I/O 线程池大小；cpu_workers: 进程池大小，为 0 时 CPU 任务在调用线程中直接执行。
+    进程池在 start() 时创建。
+    """
+
+    def __init__(self, io_workers=8, cpu_workers=2):
+        self.cpu_workers = cpu_workers
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self.cpu_pool = None
+        self._jobs = {}
+        self._heap = []  # (到期时间, 序号, 任务名称, 是否为周期执行)
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """创建进程池并启动调度线程"""
+        if self.cpu_workers > 0 and self.cpu_pool is None:
+            self.cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=process_context())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="scheduler")
+            self._thread.start()
+
+    def every(self, interval, func, name=None, run_now=True, align=True):
+        """
+        注册定时任务，按固定频率每 interval 秒执行一次（可以小于 1 秒）。
+        align 为 True 时周期对齐到本地时间的整数倍；run_now 为 True 时先立即执行一次，
+        之后从下一个对齐时刻开始按周期执行。
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        name = name or func.__name__
+        with self._cond:
+            self._jobs[name] = Job(name, interval, func, align)
+            now = time.monotonic()
+            first = now + next_boundary(interval, align)
+            self._push(first, name, True)
+            # 离下一个对齐时刻很近时不再额外执行一次
+            if run_now and first - now > interval / 2:
+                self._push(now, name, False)
+            self._cond.notify()
+
+    def _push(self, due, name, periodic):
+        """periodic 为 False 的是一次性的额外执行，不安排下一周期"""
+        self._counter += 1
+        heapq.heappush(self._heap, (due, self._counter, name, periodic))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                due, _, name, periodic = heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+                if job is None:
+                    continue
+                lateness = time.monotonic() - due
+                if periodic:
+                    # 落后超过一个周期时只执行最近的一个周期，之前的计为错过
+                    missed = math.floor(lateness / job.interval) if lateness >= job.interval else 0
+                    if missed:
+                        job.missed += missed
+                        lateness -= missed * job.interval
+                        print(f"定时任务 {name} 错过 {missed} 个周期")
+                    self._push(due + (missed + 1) * job.interval, name, True)
+                job.ticks += 1
+                job.last_lateness = lateness
+                job.max_lateness = max(job.max_lateness, lateness)
+                job.total_lateness += lateness
+                if job.running:
+                    job.skipped += 1
+                    print(f"定时任务 {name} 上一次尚未结束，跳过本次")
+                    continue
+                job.running = True
+            self.io_pool.submit(self._execute, job)
+
+    def _execute(self, job):
+        started = time.monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            job.errors += 1
+            print(f"定时任务 {job.name} 出错: {e}")
+        finally:
+            with self._cond:
+                job.running = False
+                job.runs += 1
+                job.last_duration = time.monotonic() - started
+
+    def run_cpu(self, func, *args):
+        """在进程池中执行 CPU 密集的任务并等待结果；func 和参数必须可以被 pickle"""
+        if self.cpu_pool is None:
+            return func(*args)
+        return self.cpu_pool.submit(func, *args).result()
+
+    async def run_io(self, func, *args, **kwargs):
+        """在 I/O 线程池中执行阻塞调用（供异步接口使用）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        """停止调度线程并关闭所有执行器"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            due = {}
+            for at, _, name, _ in self._heap:
+                due[name] = min(at, due.get(name, at))
+            return {
+                "cpu_workers": self.cpu_workers if self.cpu_pool is not None else 0,
+                "jobs": [
+                    {
+                        "name": job.name,
+                        "interval": job.interval,
+                        "aligned": job.align,
+                        "running": job.running,
+                        "ticks": job.ticks,
+                        "runs": job.runs,
+                        "missed": job.missed,
+                        "skipped": job.skipped,
+                        "errors": job.errors,
+                        "lateness_ms": {
+                            "last": round(job.last_lateness * 1000, 2) if job.last_lateness is not None else None,
+                            "max": round(job.max_lateness * 1000, 2),
+                            "avg": round(job.total_lateness / job.ticks * 1000, 2) if job.ticks else None,
+                        },
+                        "next_in": round(max(0.0, due[job.name] - now), 3) if job.name in due else None,
+                        "last_duration_ms": (
+                            round(job.last_duration * 1000, 1) if job.last_duration is not None else None
+                        ),
+                    }
+                    for job in self._jobs.values()
+                ],
+            }
@@ -0,0 +1,16 @@
+// HTML快照页面共用脚本
+
+// 检测深色模式
+if (window.matchMedia && window.matchMedia("(prefers-color-scheme: dark)").matches) {
+  document.documentElement.classList.add("dark");
+}
+
+// 为外部链接添加安全属性
+document.addEventListener("DOMContentLoaded", () => {
+  const externalLinks = document.querySelectorAll('a[href^="http"]');
+  externalLinks.forEach((link) => {
+    if (!link.getAttribute("rel")) {
+      link.setAttribute("rel", "noopener noreferrer");
+    }
+  });
+});
@@ -0,0 +1,68 @@
+"""
+主题级缓存
+
+按主题ID保存已渲染的主题页面，以及渲染时主题的版本（last_posted_at / bumped_at）。
+调用方从主题列表中得知当前版本时，版本一致即可直接复用；不知道版本时只在 TTL 内复用。
+超过 max_entries 时淘汰最久未使用的主题。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TopicCache:
+    """TTL + LRU 的已渲染主题缓存"""
+
+    def __init__(self, max_entries=64, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items = OrderedDict()  # 主题ID -> (版本, 写入时间, 内容)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, topic_id, version=None):
+        """
+        返回缓存的内容，未命中时返回 None。
+        version 不为 None 时要求与缓存的版本一致；为 None 时只检查是否在 TTL 内。
+        """
+        key = str(topic_id)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            cached_version, stored_at, content = entry
+            if version is not None:
+                fresh = cached_version == version
+            else:
+                fresh = time.monotonic() - stored_at < self.ttl
+            if not fresh:
+                del self._items[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def put(self, topic_id, version, content):
+        """保存主题内容及其版本"""
+        key = str(topic_id)
+        with self._lock:
+            self._items[key] = (version, time.monotonic(), content)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
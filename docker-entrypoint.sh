@@ -7,6 +7,7 @@ Xvfb :99 -screen 0 1280x1024x24 -ac &
 # 确保app/static/screenshots目录存在
 mkdir -p app/static/screenshots/thumbnails
 mkdir -p app/static/screenshots/html
+mkdir -p data
 
 # 等待Xvfb启动
 sleep 2